@@ -3,24 +3,81 @@ This script starts a FastAPI application using Uvicorn server.
 
 Steps:
 1. Imports necessary modules and libraries.
-2. Configures FastAPI application with a base path and openapi tags.
-3. Adds CORS middleware for handling Cross-Origin Resource Sharing.
+2. Configures FastAPI application with a base path, openapi tags and a lifespan that connects to MongoDB,
+   creates the time-series log collections, creates the indexes in the background and starts the archive, GeoIP and rollup jobs on startup, and stops the export jobs, drains the
+   ingest buffers and closes the MongoDB clients on shutdown.
+3. Adds CORS middleware for handling Cross-Origin Resource Sharing and the middleware recording request latency.
 4. Sets the secret key for the FastAPI application.
-5. Includes various routers for different functionalities (blog, login, admin, mediji).
+5. Includes various routers for different functionalities (logs of every tenant, exports, login, admin, health, metrics).
 6. If the script is run directly (not imported), it drops the database and seeds it, then starts the Uvicorn server.
 """
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src import env
-from src.routes import login
-from src.routes.hsalen import loggs_hsalen
-from src.routes.portfolio_dj import portfolio_dj
+from src.routes import admin, exports, health, login, logs, metrics
+from src.services import db, geoip, indexes, ingest_buffer, live_tail, retention, rollups
+from src.services.delete_jobs import delete_jobs
+from src.services.export_jobs import clean_spool, export_jobs
+from src.services.metrics import MetricsMiddleware
+from src.services.tenants import tenants
 from src.tags_metadata import tags_metadata
 
-app = FastAPI(openapi_tags=tags_metadata)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the MongoDB clients and warm up their connection pools
+    reachable = await db.connect()
+
+    # Create the time-series log collections before the first log is written
+    await indexes.ensure_timeseries_collections(reachable)
+
+    # Create the indexes of the reachable tenants in the background (no-op for existing indexes)
+    indexes_task = asyncio.create_task(indexes.bootstrap_indexes(reachable))
+
+    # Delete export files left behind by a previous process
+    clean_spool()
+
+    # Move expired logs into the archive in the background
+    archiving = retention.has_archive_policies() and retention.check_compression()
+    retention_task = asyncio.create_task(retention.run_retention()) if archiving else None
+
+    # Resolve the location of the client hosts of new backend logs in the background
+    geoip_task = asyncio.create_task(geoip.run_enrichment()) if env.GEOIP_DATABASE else None
+
+    # Keep the rollups of the dashboards up to date in the background
+    rollups_task = asyncio.create_task(rollups.run_rollups()) if env.ROLLUPS else None
+
+    yield
+
+    # Stop the background tasks; one that already failed must not keep the buffers from being written
+    tasks = [task for task in (indexes_task, retention_task, geoip_task, rollups_task) if task]
+    for task in tasks:
+        task.cancel()
+    for task, result in zip(tasks, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(result, Exception):
+            logger.error("Background task %s failed", task.get_coro().__qualname__, exc_info=result)
+
+    # Stop the export and delete jobs and the change streams of the live tail
+    await export_jobs.shutdown()
+    await delete_jobs.shutdown()
+    await live_tail.broker.shutdown()
+
+    # Write the logs still waiting in the ingest buffers before the worker exits
+    await ingest_buffer.drain_all()
+
+    db.close()
+
+
+app = FastAPI(openapi_tags=tags_metadata, lifespan=lifespan)
 
 # Configure CORS settings
 app.add_middleware(
@@ -31,16 +88,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record the latency of every request per route
+app.add_middleware(MetricsMiddleware)
+
 # Include various routers for different functionalities
-app.include_router(loggs_hsalen.router, prefix="/logs_hsa", tags=['Hypnosis Studio Alen'])
-app.include_router(portfolio_dj.router, prefix="/portfolio_dj", tags=['Hypnosis Studio Alen'])
+for tenant in tenants.values():
+    app.include_router(logs.create_router(tenant), prefix=tenant.url_prefix, tags=[tenant.tag or tenant.name])
 
+app.include_router(exports.router, prefix="/exports", tags=['Exports'])
 app.include_router(login.router, prefix="/login")
+app.include_router(admin.router, prefix="/admin", tags=['Admin'])
+app.include_router(health.router, tags=['Health'])
+app.include_router(metrics.router, tags=['Health'])
 
 if __name__ == '__main__':
     # Drop the database and seed it
-    # db.drop_log()
-    # db.seed_log()
+    # asyncio.run(db.drop_log())
+    # asyncio.run(db.seed_log())
 
     # Run the FastAPI application using Uvicorn server
     uvicorn.run(app, host="0.0.0.0", port=env.PORT)
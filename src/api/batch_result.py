@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class BatchResult(BaseModel):
+    inserted_count: int
+    errors: list[dict] = []
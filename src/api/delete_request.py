@@ -0,0 +1,21 @@
+import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field, root_validator
+
+from src import env
+
+
+class DeleteRequest(BaseModel):
+    source: Literal['private', 'public', 'backend']
+    before: datetime.datetime | None = None
+    domain: str | None = None
+    client_host: str | None = None
+    ids: list[str] | None = Field(None, min_items=1, max_items=env.DELETE_MAX_IDS)
+
+    @root_validator(skip_on_failure=True)
+    def check_filters(cls, values):
+        # Deleting every log is DELETE /{kind}, not a job started by an empty filter
+        if all(values.get(field) is None for field in ('before', 'domain', 'client_host', 'ids')):
+            raise ValueError("Give at least one of before, domain, client_host or ids")
+        return values
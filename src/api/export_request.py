@@ -0,0 +1,21 @@
+import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class ExportRequest(BaseModel):
+    source: Literal['private', 'public', 'backend', 'unique_client_hosts']
+    format: Literal['ndjson', 'csv', 'xlsx', 'parquet'] = 'csv'
+    date_from: datetime.datetime | None = Field(None, alias='from')
+    date_to: datetime.datetime | None = Field(None, alias='to')
+    domain: str | None = None
+    client_host: str | None = None
+    route_action: str | None = None
+    # Ordering and top-N limit of unique_client_hosts
+    sort_by: Literal['count', 'client_host'] = 'count'
+    descending: bool = True
+    top: int | None = Field(None, ge=1)
+
+    class Config:
+        allow_population_by_field_name = True
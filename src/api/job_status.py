@@ -0,0 +1,16 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    processed: int
+    total: int | None = None
+    error: str | None = None
+    created: datetime.datetime
+    finished: datetime.datetime | None = None
+    info: dict = {}
+    download_url: str | None = None
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class LogPage(BaseModel):
+    items: list[dict]
+    next_cursor: str | None = None
@@ -11,4 +11,7 @@ class BackendLogs(BaseModel):
     domain: str
     client_host: str
     content: str
+    # Filled by the GeoIP enrichment from client_host ('' if the IP could not be resolved)
+    country: Optional[str] = None
+    city: Optional[str] = None
     datum_vnosa: datetime.datetime = Field(default_factory=datetime.datetime.now)
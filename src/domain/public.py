@@ -11,4 +11,7 @@ class LoggingPublic(BaseModel):
     domain: str
     client_host: str
     content: str
+    device_type: Optional[str] = None
+    browser: Optional[str] = None
+    operating_system: Optional[str] = None
     datum_vnosa: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -1,17 +1,151 @@
+import json
 import os
 
 from dotenv import load_dotenv
 
 load_dotenv()
-PORT = int(os.getenv('PORT'))
+PORT = int(os.getenv('PORT', 8080))
 DOMAIN = str(os.getenv('DOMAIN'))
 DB_PROCES = str(os.getenv('DB_PROCES'))
 DB_PROCESS = str(os.getenv('DB_PROCESS'))
 DB_CONNECTION_LOGGING = str(os.getenv('DB_CONNECTION_LOGGING'))
 DB_CONNECTION_LOGGING_PDJ = str(os.getenv('DB_CONNECTION_LOGGING_PDJ'))
 
+# Tenants as a JSON list of {"name", "connection", "database", "prefix", "tag"}; without it
+# the hsa and portfolio_dj tenants are built from the DB_* variables above
+TENANTS = json.loads(os.getenv('TENANTS', '[]'))
+# Tenant whose database holds the users
+AUTH_TENANT = str(os.getenv('AUTH_TENANT', 'hsa'))
+
 DB_USER = str(os.getenv('DB_USER'))
 SECRET_KEY = str(os.getenv('SECRET_KEY'))
 ALGORITHM = str(os.getenv('ALGORITHM'))
 
-print('lalalalala')
+# Cache of validated access tokens; a disabled or deleted user keeps access for up to
+# TOKEN_CACHE_TTL seconds unless DELETE /admin/token_cache/{username} is called
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+# Response cache of the read routes (ETag/304); entries expire after RESPONSE_CACHE_TTL seconds
+# at the latest, for changes this worker does not see (other workers, TTL indexes)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+RESPONSE_CACHE_MAX_BODY = int(os.getenv('RESPONSE_CACHE_MAX_BODY', 1024 * 1024))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', 0))
+
+# Password verification pool and login throttling
+PASSWORD_VERIFY_WORKERS = int(os.getenv('PASSWORD_VERIFY_WORKERS', 2))
+PASSWORD_VERIFY_MAX_PENDING = int(os.getenv('PASSWORD_VERIFY_MAX_PENDING', 16))
+LOGIN_MAX_FAILURES = int(os.getenv('LOGIN_MAX_FAILURES', 5))
+LOGIN_FAILURE_WINDOW = int(os.getenv('LOGIN_FAILURE_WINDOW', 300))
+# Usernames and IPs with recent failures that are remembered, the oldest are forgotten first
+LOGIN_MAX_KEYS = int(os.getenv('LOGIN_MAX_KEYS', 10000))
+# Proxies in front of the app that append the client IP to X-Forwarded-For (1 behind the Heroku
+# router, see Procfile); 0 uses the address of the connection
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+
+# MongoDB connection pool
+DB_MAX_POOL_SIZE = int(os.getenv('DB_MAX_POOL_SIZE', 100))
+DB_MIN_POOL_SIZE = int(os.getenv('DB_MIN_POOL_SIZE', 0))
+DB_CONNECT_TIMEOUT_MS = int(os.getenv('DB_CONNECT_TIMEOUT_MS', 5000))
+DB_SOCKET_TIMEOUT_MS = int(os.getenv('DB_SOCKET_TIMEOUT_MS', 30000))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+DB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('DB_WAIT_QUEUE_TIMEOUT_MS', 5000))
+# Timeout of the ping of the readiness check
+DB_PING_TIMEOUT = float(os.getenv('DB_PING_TIMEOUT', 2.0))
+
+# Optional TTL of the log collections in days (0 keeps logs forever)
+LOG_TTL_DAYS = int(os.getenv('LOG_TTL_DAYS', 0))
+
+# Retention policies per tenant and collection, overriding LOG_TTL_DAYS, e.g.
+# {"hsa": {"backend_logs": {"mode": "archive", "days": 30}, "logging_public": {"mode": "ttl", "days": 90}}}
+RETENTION_POLICIES = json.loads(os.getenv('RETENTION_POLICIES', '{}'))
+RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 3600))
+ARCHIVE_DIR = str(os.getenv('ARCHIVE_DIR', 'archive'))
+# gzip or zstd (needs the zstandard package)
+ARCHIVE_COMPRESSION = str(os.getenv('ARCHIVE_COMPRESSION', 'gzip'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))
+
+# Pagination of the log list routes
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 1000))
+
+# Batch ingest
+INGEST_MAX_BATCH = int(os.getenv('INGEST_MAX_BATCH', 1000))
+
+# Write-behind ingest buffer of the single log POST routes
+INGEST_BUFFER = os.getenv('INGEST_BUFFER', 'true').lower() == 'true'
+INGEST_BUFFER_SIZE = int(os.getenv('INGEST_BUFFER_SIZE', 10000))
+INGEST_FLUSH_SIZE = int(os.getenv('INGEST_FLUSH_SIZE', 500))
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 1.0))
+# Retries of a flush failing with a transient error, the backoff doubles from INGEST_RETRY_BACKOFF seconds
+INGEST_RETRY_ATTEMPTS = int(os.getenv('INGEST_RETRY_ATTEMPTS', 5))
+INGEST_RETRY_BACKOFF = float(os.getenv('INGEST_RETRY_BACKOFF', 0.5))
+# Collections written fire-and-forget (w=0), comma separated, e.g. 'backend_logs'
+INGEST_UNACKNOWLEDGED = {name for name in os.getenv('INGEST_UNACKNOWLEDGED', '').split(',') if name}
+
+# Log collections stored as MongoDB time-series collections (needs MongoDB 7.0), comma separated,
+# e.g. 'backend_logs,logging_public'; existing collections are moved with python -m src.services.timeseries
+TIMESERIES_COLLECTIONS = {name for name in os.getenv('TIMESERIES_COLLECTIONS', '').split(',') if name}
+# seconds, minutes or hours: typical interval between the logs of one client host and domain
+TIMESERIES_GRANULARITY = str(os.getenv('TIMESERIES_GRANULARITY', 'seconds'))
+
+# Streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+# Background export jobs
+EXPORT_SPOOL_DIR = os.getenv('EXPORT_SPOOL_DIR', 'spool')
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+EXPORT_MAX_PENDING = int(os.getenv('EXPORT_MAX_PENDING', 100))
+# Seconds a finished export is reused for an identical request
+EXPORT_CACHE_TTL = int(os.getenv('EXPORT_CACHE_TTL', 600))
+# Seconds a finished export stays downloadable before its file is deleted
+EXPORT_RETENTION = int(os.getenv('EXPORT_RETENTION', 3600))
+
+# GeoIP enrichment of the backend logs
+# Path of a MaxMind .mmdb database or a .csv of networks, empty disables the enrichment
+GEOIP_DATABASE = os.getenv('GEOIP_DATABASE', '')
+GEOIP_CACHE_SIZE = int(os.getenv('GEOIP_CACHE_SIZE', 10000))
+GEOIP_INTERVAL = int(os.getenv('GEOIP_INTERVAL', 300))
+# Distinct client hosts resolved per round of the enrichment
+GEOIP_BATCH_SIZE = int(os.getenv('GEOIP_BATCH_SIZE', 500))
+
+# Rollups (pre-aggregated log counts) of the dashboards
+ROLLUPS = os.getenv('ROLLUPS', 'true').lower() == 'true'
+ROLLUP_INTERVAL = int(os.getenv('ROLLUP_INTERVAL', 60))
+# Seconds a log may arrive after its datum_vnosa and still be counted
+ROLLUP_LAG = int(os.getenv('ROLLUP_LAG', 120))
+# Seconds of logs aggregated per step of the catch-up
+ROLLUP_WINDOW = int(os.getenv('ROLLUP_WINDOW', 3600))
+ROLLUP_WRITE_BATCH = int(os.getenv('ROLLUP_WRITE_BATCH', 1000))
+ROLLUP_MINUTE_DAYS = int(os.getenv('ROLLUP_MINUTE_DAYS', 7))
+ROLLUP_HOUR_DAYS = int(os.getenv('ROLLUP_HOUR_DAYS', 90))
+
+# Full-text search
+SEARCH_MAX_OFFSET = int(os.getenv('SEARCH_MAX_OFFSET', 10000))
+
+# Live tail of new logs (SSE and WebSocket)
+# 'publish' (logs accepted by the POST routes of this worker) or 'change_stream' (needs a replica set)
+LIVE_TAIL_SOURCE = os.getenv('LIVE_TAIL_SOURCE', 'publish')
+LIVE_TAIL_QUEUE_SIZE = int(os.getenv('LIVE_TAIL_QUEUE_SIZE', 1000))
+LIVE_TAIL_MAX_SUBSCRIBERS = int(os.getenv('LIVE_TAIL_MAX_SUBSCRIBERS', 100))
+LIVE_TAIL_HEARTBEAT = float(os.getenv('LIVE_TAIL_HEARTBEAT', 15.0))
+
+# Storage schema of new documents: 1 (string _id and loc, text domain) or 2 (compact, see src/services/schema.py)
+SCHEMA_VERSION = int(os.getenv('SCHEMA_VERSION', 2))
+# Integer codes of the domains stored compactly, e.g. {"example.com": 1, "PRIVATE": 2}; codes must never change
+DOMAIN_CODES = json.loads(os.getenv('DOMAIN_CODES', '{}'))
+# Online migration to the compact schema
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', 1000))
+# Seconds of pause between two batches, limits the load the migration puts on the database
+MIGRATION_PAUSE = float(os.getenv('MIGRATION_PAUSE', 0.1))
+
+# Background delete jobs
+DELETE_WORKERS = int(os.getenv('DELETE_WORKERS', 1))
+DELETE_MAX_PENDING = int(os.getenv('DELETE_MAX_PENDING', 10))
+# Seconds a finished delete job stays visible
+DELETE_RETENTION = int(os.getenv('DELETE_RETENTION', 3600))
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', 1000))
+# Logs deleted per second at most (0: as fast as possible)
+DELETE_RATE = float(os.getenv('DELETE_RATE', 5000))
+DELETE_MAX_IDS = int(os.getenv('DELETE_MAX_IDS', 10000))
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.api.job_status import JobStatus
+
+from src.services import db
+from src.services.delete_jobs import delete_jobs
+from src.services.indexes import index_stats, tenant_collections
+from src.services.login_guard import login_stats
+from src.services.response_cache import response_cache
+from src.services.security import get_current_user
+from src.services.tenants import tenants
+from src.services.token_cache import token_cache
+
+# Create a new APIRouter instance for this module
+router = APIRouter()
+
+
+# GET INDEX USAGE STATISTICS
+@router.get("/indexes", operation_id="get_index_stats")
+async def get_index_stats(current_user: str = Depends(get_current_user)):
+    """
+    This route reports the usage of the indexes of every tenant.
+
+    Behavior:
+    - Returns, per tenant and collection, every index with its key and the number of operations that used it.
+    """
+    return {tenant: await index_stats(db.get_database(tenant), tenant_collections(tenant)) for tenant in tenants}
+
+
+# GET TOKEN CACHE STATISTICS
+@router.get("/token_cache", operation_id="get_token_cache_stats")
+async def get_token_cache_stats(current_user: str = Depends(get_current_user)):
+    """
+    This route reports the size and the hit/miss counters of the token cache.
+    """
+    return token_cache.stats()
+
+
+# GET RESPONSE CACHE STATISTICS
+@router.get("/response_cache", operation_id="get_response_cache_stats")
+async def get_response_cache_stats(current_user: str = Depends(get_current_user)):
+    """
+    This route reports the size, the hit/miss counters and the 304 responses of the response cache.
+    """
+    return response_cache.stats()
+
+
+# INVALIDATE CACHED TOKENS OF A USER
+@router.delete("/token_cache/{username}", operation_id="invalidate_user_tokens")
+async def invalidate_user_tokens(username: str, current_user: str = Depends(get_current_user)):
+    """
+    This route removes the cached tokens of a user, e.g. after the user was disabled.
+
+    Behavior:
+    - The next request with any of the user's tokens is validated against the database again.
+    - Returns the number of removed tokens.
+    """
+    return {"invalidated": token_cache.invalidate_user(username)}
+
+
+# GET LOGIN STATISTICS
+@router.get("/login_stats", operation_id="get_login_stats")
+async def get_login_stats(current_user: str = Depends(get_current_user)):
+    """
+    This route reports the login attempts, failures, throttled attempts and the login latency histogram.
+    """
+    return login_stats.stats()
+
+
+# GET DELETE JOB STATUS
+@router.get("/deletions/{job_id}", operation_id="get_deletion_status")
+async def get_deletion_status(job_id: str, current_user: str = Depends(get_current_user)) -> JobStatus:
+    """
+    This route reports the status and progress of a delete job.
+
+    Behavior:
+    - Returns the status (queued, running, done or failed), the number of logs that matched
+      the filter when the job started (total) and the number deleted so far (processed).
+    """
+    job = delete_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Deletion by ID:({job_id}) not found")
+    return JobStatus(**job.to_dict())
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.api.job_status import JobStatus
+from src.services.export import MEDIA_TYPES
+from src.services.export_jobs import export_jobs
+from src.services.jobs import Job
+
+# Create a new APIRouter instance for this module
+router = APIRouter()
+
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def job_status(job: Job) -> JobStatus:
+    """
+    This function converts an export job into its response, with the download URL once the file is ready.
+    """
+    download_url = f"/exports/{job.id}/download" if job.status == 'done' else None
+    info = {key: value for key, value in job.info.items() if key != 'partial'}
+    return JobStatus(**job.to_dict() | {'info': info}, download_url=download_url)
+
+
+def byte_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    This function parses a single-range Range header into the first and last byte to send.
+
+    Behavior:
+    - Returns None for headers it does not support (e.g. several ranges), so the whole file is sent.
+    - Raises HTTPException (416) if the range lies outside the file.
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def read_file(path: str, start: int, end: int, chunk_size: int = 64 * 1024):
+    """
+    This generator yields the bytes start..end (inclusive) of a file in chunks.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(file.read, min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def get_job(job_id: str) -> Job:
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Export by ID:({job_id}) not found")
+    return job
+
+
+# GET EXPORT STATUS
+@router.get("/{job_id}", operation_id="get_export_status")
+async def get_export_status(job_id: str) -> JobStatus:
+    """
+    This route reports the status and progress of an export job.
+
+    Behavior:
+    - Returns the status (queued, running, done or failed), the number of written rows and,
+      for log exports, the total number of matching logs.
+    - Returns the download URL once the export is done.
+    """
+    return job_status(get_job(job_id))
+
+
+# DOWNLOAD EXPORT
+@router.get("/{job_id}/download", operation_id="download_export")
+async def download_export(job_id: str, request: Request):
+    """
+    This route downloads the file of a finished export job.
+
+    Behavior:
+    - Answers 409 if the export is not done yet.
+    - Supports a single byte range (Range: bytes=start-end) with 206 Partial Content,
+      so interrupted downloads can be resumed.
+    """
+    job = get_job(job_id)
+    if job.status != 'done' or not job.result or not os.path.exists(job.result):
+        raise HTTPException(status_code=409, detail=f"Export by ID:({job_id}) is {job.status}")
+
+    media_type = MEDIA_TYPES[job.info['format']]
+    headers = {'Accept-Ranges': 'bytes', 'Content-Disposition': f"attachment; filename={job.info['filename']}"}
+    size = os.path.getsize(job.result)
+
+    requested = byte_range(request.headers['range'], size) if 'range' in request.headers else None
+    if requested is None:
+        return FileResponse(job.result, media_type=media_type, headers=headers)
+
+    start, end = requested
+    headers |= {'Content-Range': f'bytes {start}-{end}/{size}', 'Content-Length': str(end - start + 1)}
+    return StreamingResponse(read_file(job.result, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src import env
+from src.services import db
+
+# Create a new APIRouter instance for this module
+router = APIRouter()
+
+
+# LIVENESS
+@router.get("/healthz", operation_id="healthz")
+async def healthz():
+    """
+    This route reports that the worker process is alive; it does not touch the database.
+    """
+    return {"status": "ok"}
+
+
+# READINESS
+@router.get("/readyz", operation_id="readyz")
+async def readyz():
+    """
+    This route reports whether the worker can serve requests.
+
+    Behavior:
+    - Pings every cluster and reports its connection pool statistics, grouped by tenants
+      (connection strings are not shown, they may contain credentials).
+    - A cluster is saturated if all DB_MAX_POOL_SIZE connections of the pool of one of its servers
+      are checked out and requests are waiting for that server.
+    - Answers 503 if a cluster is unreachable or saturated, so the load balancer routes elsewhere.
+    """
+    clusters = []
+    ready = True
+
+    for connection, tenant_names in db.clusters().items():
+        reachable = await db.ping(connection)
+        pool = db.pool_stats[connection].stats()
+        saturated_servers = db.pool_stats[connection].saturated(env.DB_MAX_POOL_SIZE)
+        saturated = bool(saturated_servers)
+        ready = ready and reachable and not saturated
+        clusters.append({"tenants": tenant_names, "reachable": reachable, "saturated": saturated,
+                         "saturated_servers": saturated_servers, "pool": pool})
+
+    return JSONResponse(
+        content={"status": "ready" if ready else "not ready", "clusters": clusters},
+        status_code=200 if ready else 503,
+    )
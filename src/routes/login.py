@@ -1,10 +1,12 @@
+import time
 from datetime import timedelta
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Request
 from fastapi.security import OAuth2PasswordRequestForm
 
 from src.api.token import Token
+from src.services.login_guard import client_ip, login_stats, login_throttle
 from src.services.security import authenticate_user, create_access_token
 
 # Create a new APIRouter instance for this module
@@ -13,21 +15,35 @@ router = APIRouter()
 
 # Route for user authentication and obtaining an access token
 @router.post("/", response_model=Token)
-async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], request: Request):
     """
     This route handles user authentication by validating the provided credentials (username and password).
     If the credentials are correct, it generates an access token and returns it to the client.
 
     Args:
         form_data (OAuth2PasswordRequestForm): The user's credentials.
+        request (Request): The request, used for the client IP of the login throttle.
 
     Returns:
         dict: A dictionary containing the access token and its type.
     """
 
+    # Reject the attempt before hashing anything if the username or IP failed too often
+    client_host = client_ip(request)
+    try:
+        login_throttle.check(form_data.username, client_host)
+    except HTTPException:
+        login_stats.throttled += 1
+        raise
+
     # Authenticate the user using the provided username and password
-    user = authenticate_user(form_data.username, form_data.password)
+    start = time.perf_counter()
+    user = await authenticate_user(form_data.username, form_data.password)
+    login_stats.observe(time.perf_counter() - start, success=user is not None)
+
     if not user:
+        login_throttle.failed(form_data.username, client_host)
+
         # Raise an exception if the authentication fails
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,6 +51,8 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    login_throttle.succeeded(form_data.username)
+
     # Set the expiration time for the access token to 30 minutes
     access_token_expires = timedelta(minutes=30)
 
@@ -0,0 +1,499 @@
+"""
+This module defines the API routes for the logs of a tenant.
+
+create_router builds the same set of routes for every tenant from the tenant registry;
+the routes of a tenant only differ in the database they use.
+
+Routes (for each of private, public and backend logs):
+1. GET a page of logs, follow new logs live, search their content, export them as NDJSON, CSV or XLSX, query the archive, read the rollups
+2. ADD a new log or a batch of logs
+3. DELETE a log by ID or all logs
+Public logs also have device statistics, backend logs client host and geo statistics.
+Large exports of any kind of logs or of the client host statistics run as background jobs (POST /exports),
+and so do deletions of the logs matching a filter (POST /deletions).
+The pages of logs and the statistics are served from the response cache (ETag/304) until the logs change.
+"""
+# Import necessary modules and classes
+import datetime
+from typing import Dict, Literal
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+
+from src import env
+from src.api.batch_result import BatchResult
+from src.api.delete_request import DeleteRequest
+from src.api.export_request import ExportRequest
+from src.api.job_status import JobStatus
+from src.api.log_page import LogPage
+from src.domain.backend import BackendLogs
+from src.domain.geo_data import GeoData
+from src.domain.private import LoggingPrivate
+from src.domain.public import LoggingPublic
+from src.routes.exports import job_status
+from src.services import db
+from src.services.metrics import logs_ingested
+from src.services.analytics import HostStatsParams, client_host_counts, client_host_pipeline, \
+    daily_client_host_counts, device_counts, geo_counts
+from src.services.delete_jobs import submit_delete
+from src.services.device import add_device, normalize_device_type
+from src.services.export import export_response, ndjson_stream
+from src.services.export_jobs import submit_export
+from src.services.ingest import insert_batch, read_batch
+from src.services.ingest_buffer import enqueue
+from src.services.live_tail import broker, sse_stream, websocket_stream
+from src.services.pagination import SORT, PageParams, find_page, log_filters
+from src.services.response_cache import cached_response, response_cache
+from src.services.retention import read_archive
+from src.services.rollups import DIMENSIONS, read_rollups
+from src.services.schema import compact, expand, expanded, id_condition
+from src.services.search import search_page
+from src.services.security import get_current_user
+from src.services.serialization import RawJSONResponse
+from src.services.tenants import Tenant
+
+# Kind of logs, its collection, its model and the function completing a log before it is written
+LOG_KINDS = (
+    ('private', 'logging_private', LoggingPrivate, None),
+    ('public', 'logging_public', LoggingPublic, add_device),
+    ('backend', 'backend_logs', BackendLogs, None),
+)
+
+
+def add_log_routes(router: APIRouter, tenant: Tenant, kind: str, collection_name: str, model, prepare=None):
+    """
+    This function adds the list, export, archive, ingest and delete routes of one kind of logs.
+
+    Parameters:
+    - router (APIRouter): The router of the tenant.
+    - tenant (Tenant): The tenant the routes belong to.
+    - kind (str): The URL path of the kind (private, public or backend).
+    - collection_name (str): The collection holding the logs.
+    - model: The domain model of the logs.
+    - prepare: Optional function that completes a log before it is written.
+    """
+
+    def collection():
+        return db.get_database(tenant.name)[collection_name]
+
+    # GET ALL LOGS
+    @router.get(f"/{kind}", operation_id=f"get_all_{kind}_logs_{tenant.name}", response_model=LogPage)
+    async def get_all_logs(request: Request, filters: dict = Depends(log_filters), page: PageParams = Depends()):
+        """
+        This route handles the paginated retrieval of logs from the database.
+
+        Behavior:
+        - Filters the logs by time range (from/to), domain, client_host and route_action.
+        - Returns at most `limit` logs, newest first, projected to `fields` if given.
+        - Returns the cursor of the next page in next_cursor (None on the last page).
+        - Encodes the documents as they are stored, they were validated when they were added.
+        - Serves the page from the response cache until the logs change (ETag, 304 Not Modified).
+        """
+
+        # Retrieve one page of logs from the database
+        return await cached_response(request, (collection(),), lambda: find_page(collection(), model, filters, page))
+
+    # FOLLOW NEW LOGS (SERVER-SENT EVENTS)
+    @router.get(f"/{kind}/tail", operation_id=f"tail_{kind}_logs_{tenant.name}")
+    async def tail_logs(request: Request, filters: dict = Depends(log_filters)):
+        """
+        This route streams the new logs as Server-Sent Events while they are added.
+
+        Behavior:
+        - Sends only the logs matching the domain, client_host and route_action (and from/to) filters.
+        - Sends every log as a "log" event; a "dropped" event tells a slow client how many logs it lost.
+        - Sends a heartbeat comment every LIVE_TAIL_HEARTBEAT seconds without logs.
+        """
+        return sse_stream(tenant.name, collection_name, filters, request)
+
+    # FOLLOW NEW LOGS (WEBSOCKET)
+    @router.websocket(f"/{kind}/tail/ws")
+    async def tail_logs_websocket(websocket: WebSocket, filters: dict = Depends(log_filters)):
+        """
+        This route sends the new logs over a WebSocket while they are added, like the /tail route.
+        """
+        await websocket_stream(tenant.name, collection_name, filters, websocket)
+
+    # SEARCH LOGS
+    @router.get(f"/{kind}/search", operation_id=f"search_{kind}_logs_{tenant.name}", response_model=LogPage)
+    async def search_logs(
+            request: Request,
+            q: str = Query(..., description='Words (any of them), "phrases" (all of them) and -excluded words'),
+            order: Literal['time', 'relevance'] = Query('time', description="Newest first or best match first"),
+            filters: dict = Depends(log_filters),
+            page: PageParams = Depends()):
+        """
+        This route handles the full-text search of the log content.
+
+        Behavior:
+        - Searches the content with the text index, restricted by time range (from/to), domain,
+          client_host and route_action.
+        - Orders the logs newest first or by relevance (with a score field).
+        - Returns at most `limit` logs and the cursor of the next page in next_cursor (None on the last page).
+        - Serves the page from the response cache until the logs change (ETag, 304 Not Modified).
+        """
+        return await cached_response(request, (collection(),),
+                                     lambda: search_page(collection(), model, filters, q, order, page))
+
+    # EXPORT LOGS AS NDJSON, CSV OR EXCEL
+    @router.get(f"/{kind}/export", operation_id=f"export_{kind}_logs_{tenant.name}")
+    async def export_logs(
+            filters: dict = Depends(log_filters),
+            export_format: Literal['ndjson', 'csv', 'xlsx'] = Query('ndjson', alias="format",
+                                                                   description="Format of the export")):
+        """
+        This route streams all logs matching the filters as newline-delimited JSON, CSV or an Excel file.
+
+        Behavior:
+        - Filters the logs by time range (from/to), domain, client_host and route_action.
+        - Streams the logs batch by batch, so memory use does not grow with the collection.
+        - Writes one column per field of the logs in CSV and Excel exports, newest log first.
+        """
+        if export_format == 'ndjson':
+            return StreamingResponse(ndjson_stream(collection(), filters), media_type="application/x-ndjson",
+                                     headers={'Content-Disposition': f'attachment; filename={collection_name}.ndjson'})
+
+        columns = [field.alias for field in model.__fields__.values()]
+        documents = expanded(collection().find(filters).sort(SORT).batch_size(env.EXPORT_BATCH_SIZE))
+        return export_response(documents, columns, collection_name, export_format)
+
+    # GET ROLLUPS
+    @router.get(f"/{kind}/rollups", operation_id=f"get_{kind}_rollups_{tenant.name}")
+    async def get_rollups(
+            dimension: Literal['total', 'domain', 'route_action', 'client_host', 'device_type'] = Query(
+                'total', description="Count in total or per value of this field"),
+            granularity: Literal['minute', 'hour', 'day'] = Query('hour', description="Size of the buckets"),
+            date_from: datetime.datetime | None = Query(None, alias="from", description="Only buckets from this time on"),
+            date_to: datetime.datetime | None = Query(None, alias="to", description="Only buckets before this time"),
+            value: str | None = Query(None, description="Only the counts of this value of the dimension"),
+            totals: bool = Query(False, description="Sum the buckets per value")):
+        """
+        This route returns the pre-aggregated log counts of the dashboards.
+
+        Behavior:
+        - Reads the rollups kept up to date by the rollup job instead of aggregating the logs,
+          so logs of the last ROLLUP_LAG seconds are not counted yet.
+        - Returns a list of dictionaries with bucket, value and count fields, or value and count fields if totals is set.
+        """
+        if dimension != 'total' and dimension not in DIMENSIONS[collection_name]:
+            raise HTTPException(status_code=400, detail=f"The {kind} logs are not counted by {dimension}")
+
+        response_data = await read_rollups(db.get_database(tenant.name), collection_name, dimension, granularity,
+                                           date_from, date_to, value, totals)
+        return RawJSONResponse(response_data)
+
+    # QUERY ARCHIVED LOGS
+    @router.get(f"/{kind}/archive", operation_id=f"get_archived_{kind}_logs_{tenant.name}")
+    async def get_archived_logs(filters: dict = Depends(log_filters)):
+        """
+        This route streams the archived logs matching the filters as newline-delimited JSON.
+
+        Behavior:
+        - Reads only the archive files of the days in the from/to interval.
+        - Filters the archived logs by domain, client_host and route_action.
+        """
+        return StreamingResponse(read_archive(tenant.name, collection_name, filters), media_type="application/x-ndjson")
+
+    # ADD NEW LOG
+    @router.post(f"/{kind}", operation_id=f"add_{kind}_log_{tenant.name}")
+    async def post_one_log(logs: model, response: Response) -> model | None:
+        """
+        This route adds a new log to the database.
+
+        Parameters:
+        - logs (Logging): The log object to be added.
+
+        Behavior:
+        - Completes the log (e.g. the device of public logs) before it is written.
+        - Adds a new log to the database.
+        - With the ingest buffer enabled, queues the log and answers 202 without waiting for the database.
+        - Returns the added Logging object if successful, or None if unsuccessful.
+        """
+
+        # Add a new log to the database
+        log_dict = logs.dict(by_alias=True)
+        if prepare:
+            log_dict = prepare(log_dict)
+
+        if env.INGEST_BUFFER:
+            # Queue the log, the next flush of the ingest buffer writes it to the database
+            enqueue(collection(), compact(log_dict, collection_name))
+            logs_ingested.inc((tenant.name, kind))
+            broker.publish(tenant.name, collection_name, log_dict)
+            response.status_code = status.HTTP_202_ACCEPTED
+            return model(**log_dict)
+
+        insert_result = await collection().insert_one(compact(log_dict, collection_name))
+        response_cache.bump(collection())
+
+        # Check if the insertion was acknowledged and update the log's ID
+        if insert_result.acknowledged:
+            logs_ingested.inc((tenant.name, kind))
+            broker.publish(tenant.name, collection_name, log_dict)
+            log_dict['_id'] = str(insert_result.inserted_id)
+            return model(**log_dict)
+        else:
+            return None
+
+    # ADD A BATCH OF LOGS
+    @router.post(f"/{kind}/batch", operation_id=f"add_{kind}_logs_batch_{tenant.name}")
+    async def post_logs_batch(request: Request) -> BatchResult:
+        """
+        This route adds a batch of logs to the database.
+
+        Parameters:
+        - request (Request): A JSON array or an NDJSON body of log records.
+
+        Behavior:
+        - Validates every record and writes the valid ones with one unordered insert.
+        - Returns the number of inserted logs and the errors of the rejected records by index.
+        """
+
+        # Add the batch of logs to the database
+        items = await read_batch(request)
+        result = await insert_batch(collection(), model, items, prepare,
+                                    on_inserted=lambda document: broker.publish(tenant.name, collection_name, document))
+        logs_ingested.inc((tenant.name, kind), result['inserted_count'])
+        return BatchResult(**result)
+
+    # DELETE LOG BY ID
+    @router.delete(f"/{kind}/{{_id}}", operation_id=f"delete_{kind}_log_admin_{tenant.name}")
+    async def delete_log_admin(_id: str, current_user: str = Depends(get_current_user)):
+        """
+        Route to delete a log by its ID from the database.
+
+        Arguments:
+            _id (str): The ID of the log to be deleted.
+            current_user (str): The current authenticated user.
+
+        Returns:
+            dict: A message indicating the status of the deletion.
+
+        Raises:
+            HTTPException: If the log is not found for deletion.
+            :param _id: ID of the log
+        """
+
+        # Attempt to delete the log from the database
+        delete_result = await collection().delete_one({'_id': id_condition(_id)})
+
+        # Check if the log was successfully deleted
+        if delete_result.deleted_count > 0:
+            response_cache.bump(collection())
+            return {"message": "Log deleted successfully"}
+        else:
+            raise HTTPException(status_code=404, detail=f"Log by ID:({_id}) not found")
+
+    # DELETE ALL LOGS
+    @router.delete(f"/{kind}", operation_id=f"delete_all_{kind}_logs_{tenant.name}")
+    async def delete_all_logs(current_user: str = Depends(get_current_user)):
+        result = await collection().delete_many({})
+        response_cache.bump(collection())
+        return {"deleted_count": result.deleted_count}
+
+
+def add_public_routes(router: APIRouter, tenant: Tenant):
+    """
+    This function adds the device statistics routes of the public logs.
+    """
+
+    def collection():
+        return db.get_database(tenant.name).logging_public
+
+    # GET COUNT OF LOGS CONTAINING DEVICE TYPE IN CONTENT
+    @router.get("/count_logs_with_desktop", operation_id=f"count_logs_with_desktop_{tenant.name}")
+    async def count_logs_with_desktop(
+            request: Request,
+            device_type: str = Query(..., description="Specify the device type (e.g., 'Mobile' or 'Desktop')")) -> Dict[
+        str, int]:
+        """
+        This route handles the counting of logs containing a specified device type in the content.
+
+        Behavior:
+        - Counts the number of logs with the specified device type, using the device_type index.
+        - Returns a dictionary with the count, from the response cache until the logs change.
+        """
+
+        # Count logs with the specified device type parsed from the content
+        async def count():
+            return {"count": await collection().count_documents({"device_type": normalize_device_type(device_type)})}
+
+        return await cached_response(request, (collection(),), count)
+
+    # GET COUNT OF PUBLIC LOGS PER DEVICE TYPE
+    @router.get("/device_stats", operation_id=f"get_device_stats_{tenant.name}")
+    async def get_device_stats(
+            request: Request,
+            filters: dict = Depends(log_filters),
+            group_by: Literal['device_type', 'browser', 'operating_system'] = Query(
+                'device_type', description="Parsed field to count the logs by"),
+            bucket: Literal['day'] | None = Query(None, description="Count every day separately")):
+        """
+        This route handles the counting of public logs per device type, browser or operating system.
+
+        Behavior:
+        - Counts the logs in the from/to time window per value of the group_by field.
+        - Counts every day separately if bucket is 'day'.
+        - Returns a list of dictionaries with the group_by field, count and (if bucketed) day fields.
+        """
+        return await cached_response(request, (collection(),),
+                                     lambda: device_counts(collection(), filters, group_by, bucket == 'day'))
+
+
+def add_backend_routes(router: APIRouter, tenant: Tenant):
+    """
+    This function adds the client host statistics routes of the backend logs.
+    """
+
+    def collection():
+        return db.get_database(tenant.name).backend_logs
+
+    # GET UNIQUE CLIENT HOSTS WITH VISIT COUNTS
+    @router.get("/unique_client_hosts", operation_id=f"get_unique_client_hosts_{tenant.name}")
+    async def get_unique_client_hosts(request: Request, filters: dict = Depends(log_filters),
+                                      params: HostStatsParams = Depends()):
+        """
+        This route handles the retrieval of unique client hosts and their visit counts.
+
+        Behavior:
+        - Counts the logs per client host in the database, restricted to the from/to time window.
+        - Sorts the hosts by count or client_host and returns only the first `top` hosts if given.
+        - Returns a list of dictionaries containing client_host and count fields.
+        - Serves the list from the response cache until the logs change (ETag, 304 Not Modified).
+        """
+        return await cached_response(request, (collection(),), lambda: client_host_counts(collection(), filters, params))
+
+    # GET UNIQUE CLIENT HOSTS PER DAY
+    @router.get("/unique_client_hosts/daily", operation_id=f"get_daily_unique_client_hosts_{tenant.name}")
+    async def get_daily_unique_client_hosts(request: Request, filters: dict = Depends(log_filters)):
+        """
+        This route handles the retrieval of the number of distinct client hosts per day.
+
+        Behavior:
+        - Counts the distinct client hosts and the logs of every day in the from/to time window.
+        - Returns a list of dictionaries containing day, unique_client_hosts and count fields.
+        """
+        return await cached_response(request, (collection(),), lambda: daily_client_host_counts(collection(), filters))
+
+    # GET COUNT OF BACKEND LOGS PER COUNTRY OR CITY
+    @router.get("/geo_stats", operation_id=f"get_geo_stats_{tenant.name}")
+    async def get_geo_stats(
+            request: Request,
+            filters: dict = Depends(log_filters),
+            group_by: Literal['country', 'city'] = Query('country', description="Count per country or per city"),
+            top: int | None = Query(None, ge=1, description="Return only the first N groups")):
+        """
+        This route handles the counting of backend logs and distinct client hosts per country or city.
+
+        Behavior:
+        - Counts the logs in the from/to time window whose client host was resolved by the GeoIP enrichment.
+        - Never resolves IPs itself, the location is stored in the logs by the enrichment job.
+        - Returns a list of dictionaries with country, (city,) count and unique_client_hosts fields.
+        """
+        return await cached_response(request, (collection(),), lambda: geo_counts(collection(), filters, group_by, top))
+
+    # GET CACHED GEO DATA OF AN IP
+    @router.get("/geo_data/{ip}", operation_id=f"get_geo_data_{tenant.name}")
+    async def get_geo_data(ip: str) -> GeoData:
+        """
+        This route returns the geo data of an IP from the geo_data_log cache.
+
+        Behavior:
+        - Raises HTTPException (404) if the IP has not been resolved by the enrichment job yet.
+        """
+        geo_data = await db.get_database(tenant.name).geo_data_log.find_one({'ip': ip})
+        if geo_data is None:
+            raise HTTPException(status_code=404, detail=f"Geo data of IP:({ip}) not found")
+        return GeoData(**expand(geo_data))
+
+    # EXPORT UNIQUE CLIENT HOSTS AS EXCEL OR CSV
+    @router.get("/unique_client_hosts/export", operation_id=f"export_unique_client_hosts_{tenant.name}")
+    async def export_unique_client_hosts(
+            filters: dict = Depends(log_filters),
+            params: HostStatsParams = Depends(),
+            export_format: Literal['xlsx', 'csv'] = Query('xlsx', alias="format", description="Format of the export")):
+        """
+        This route handles the retrieval of unique client hosts and their visit counts
+        and exports the data to an Excel or CSV file.
+
+        Behavior:
+        - Counts the logs per client host in the database, like /unique_client_hosts.
+        - Streams the rows while the aggregation cursor is read, instead of building the file in memory.
+        - Returns a StreamingResponse with the file.
+        """
+        documents = collection().aggregate(client_host_pipeline(filters, params), allowDiskUse=True)
+        return export_response(documents, ['client_host', 'count'], "unique_client_hosts", export_format)
+
+
+def add_export_job_routes(router: APIRouter, tenant: Tenant):
+    """
+    This function adds the route starting background export jobs.
+    """
+
+    # START AN EXPORT JOB
+    @router.post("/exports", status_code=status.HTTP_202_ACCEPTED, operation_id=f"create_export_{tenant.name}")
+    async def create_export(export: ExportRequest, response: Response) -> JobStatus:
+        """
+        This route starts an export of logs or of the client host statistics in the background.
+
+        Parameters:
+        - export (ExportRequest): The source (private, public, backend or unique_client_hosts), the format
+          (ndjson, csv, xlsx or parquet), the filters and, for unique_client_hosts, the ordering.
+
+        Behavior:
+        - Returns the job at once; its status and download URL are at /exports/{id} (see Location).
+        - An identical request while the job runs, or shortly after it finished, returns the same job.
+        """
+        if export.source == 'unique_client_hosts':
+            collection_name, columns = 'backend_logs', ['client_host', 'count']
+        else:
+            collection_name, model = next((name, model) for kind, name, model, _ in LOG_KINDS if kind == export.source)
+            columns = [field.alias for field in model.__fields__.values()]
+
+        job = submit_export(tenant.name, export, collection_name, columns)
+        response.headers['Location'] = f"/exports/{job.id}"
+        return job_status(job)
+
+
+def add_delete_job_routes(router: APIRouter, tenant: Tenant):
+    """
+    This function adds the route starting background delete jobs.
+    """
+
+    # START A DELETE JOB
+    @router.post("/deletions", status_code=status.HTTP_202_ACCEPTED, operation_id=f"create_deletion_{tenant.name}")
+    async def create_deletion(deletion: DeleteRequest, response: Response,
+                              current_user: str = Depends(get_current_user)) -> JobStatus:
+        """
+        This route starts the deletion of the logs matching a filter in the background.
+
+        Parameters:
+        - deletion (DeleteRequest): The source (private, public or backend) and at least one of
+          before (delete logs older than this time), domain, client_host and ids.
+
+        Behavior:
+        - Returns the job at once; its progress is at /admin/deletions/{id} (see Location).
+        - Deletes the logs in chunks at a limited rate, so it does not slow down the ingest of new logs.
+        - An identical request while the job is queued or running returns the same job.
+        """
+        collection_name = next(name for kind, name, _, _ in LOG_KINDS if kind == deletion.source)
+        job = submit_delete(tenant.name, collection_name, deletion)
+        response.headers['Location'] = f"/admin/deletions/{job.id}"
+        return JobStatus(**job.to_dict())
+
+
+def create_router(tenant: Tenant) -> APIRouter:
+    """
+    This function creates the router with all log routes of a tenant.
+    """
+    router = APIRouter()
+
+    for kind, collection_name, model, prepare in LOG_KINDS:
+        add_log_routes(router, tenant, kind, collection_name, model, prepare)
+
+    add_public_routes(router, tenant)
+    add_backend_routes(router, tenant)
+    add_export_job_routes(router, tenant)
+    add_delete_job_routes(router, tenant)
+
+    return router
@@ -0,0 +1,49 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.services import db, ingest_buffer, metrics
+from src.services.login_guard import login_stats
+from src.services.response_cache import response_cache
+from src.services.token_cache import token_cache
+
+# Create a new APIRouter instance for this module
+router = APIRouter()
+
+
+# PROMETHEUS METRICS
+@router.get("/metrics", operation_id="get_metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    This route exposes the metrics of the worker in the Prometheus text exposition format.
+
+    Behavior:
+    - Copies the current connection pool, ingest buffer, token cache, login and response cache counters into the metrics.
+    - Returns request latency per operation_id, MongoDB command latency per collection, pool wait time,
+      logs ingested per tenant and requests in flight.
+    """
+    for stats in db.pool_stats.values():
+        pool = stats.stats()
+        for state in ('open', 'checked_out', 'waiting'):
+            metrics.pool_connections.set((stats.name, state), pool[state])
+
+    for name, buffer in ingest_buffer.buffers.items():
+        metrics.ingest_queued.set((name,), buffer.queue.qsize())
+        metrics.ingest_dropped.set((name,), buffer.failed)
+
+    cache = token_cache.stats()
+    metrics.token_cache_lookups.set(('hit',), cache['hits'])
+    metrics.token_cache_lookups.set(('miss',), cache['misses'])
+
+    login = login_stats.stats()
+    metrics.login_attempts.set(('success',), login['attempts'] - login['failures'])
+    metrics.login_attempts.set(('failure',), login['failures'])
+    metrics.login_attempts.set(('throttled',), login['throttled'])
+
+    responses = response_cache.stats()
+    metrics.response_cache_lookups.set(('hit',), responses['hits'])
+    metrics.response_cache_lookups.set(('miss',), responses['misses'])
+    metrics.response_cache_not_modified.set((), responses['not_modified'])
+    metrics.response_cache_hit_ratio.set((), responses['hit_ratio'])
+    metrics.response_cache_entries.set((), responses['size'])
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,151 @@
+"""
+Aggregations over the log collections.
+
+The statistics are computed by MongoDB with $group pipelines, so only the aggregated rows
+travel over the wire instead of every log of the collection.
+"""
+from typing import Literal
+
+from fastapi import Query
+
+
+class HostStatsParams:
+    """
+    Dependency holding the ordering and the top-N limit of the client host statistics.
+    """
+
+    def __init__(
+            self,
+            sort_by: Literal['count', 'client_host'] = Query('count', description="Field to sort the hosts by"),
+            descending: bool = Query(True, description="Sort in descending order"),
+            top: int | None = Query(None, ge=1, description="Return only the first N hosts")):
+        self.sort_by = sort_by
+        self.descending = descending
+        self.top = top
+
+
+def client_host_pipeline(filters: dict, params: HostStatsParams) -> list[dict]:
+    """
+    This function builds the pipeline counting the logs of every client host.
+
+    Parameters:
+    - filters (dict): The filter built by log_filters (e.g. the from/to time window).
+    - params (HostStatsParams): The ordering and top-N limit.
+
+    Behavior:
+    - Groups the matching logs by client_host and counts them in the database.
+    - Projects every group to a dictionary with client_host and count fields.
+    """
+    direction = -1 if params.descending else 1
+    sort = {'count': direction, '_id': 1} if params.sort_by == 'count' else {'_id': direction}
+
+    pipeline = [{'$match': filters}] if filters else []
+    pipeline += [
+        {'$group': {'_id': '$client_host', 'count': {'$sum': 1}}},
+        {'$sort': sort},
+    ]
+    if params.top:
+        pipeline.append({'$limit': params.top})
+    pipeline.append({'$project': {'_id': 0, 'client_host': '$_id', 'count': '$count'}})
+
+    return pipeline
+
+
+async def client_host_counts(collection, filters: dict, params: HostStatsParams) -> list[dict]:
+    """
+    This function counts the logs of every client host.
+
+    Behavior:
+    - Runs the pipeline of client_host_pipeline.
+    - Returns a list of dictionaries with client_host and count fields.
+    """
+    return await collection.aggregate(client_host_pipeline(filters, params), allowDiskUse=True).to_list(length=None)
+
+
+async def daily_client_host_counts(collection, filters: dict) -> list[dict]:
+    """
+    This function counts the distinct client hosts and the logs of every day.
+
+    Parameters:
+    - collection: The MongoDB collection to aggregate.
+    - filters (dict): The filter built by log_filters (e.g. the from/to time window).
+
+    Behavior:
+    - Groups the matching logs by day and client_host, then groups the result by day.
+    - Returns a list of dictionaries with day, unique_client_hosts and count fields, oldest day first.
+    """
+    pipeline = [{'$match': filters}] if filters else []
+    pipeline += [
+        {'$group': {
+            '_id': {'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$datum_vnosa'}},
+                    'client_host': '$client_host'},
+            'count': {'$sum': 1},
+        }},
+        {'$group': {'_id': '$_id.day', 'unique_client_hosts': {'$sum': 1}, 'count': {'$sum': '$count'}}},
+        {'$sort': {'_id': 1}},
+        {'$project': {'_id': 0, 'day': '$_id', 'unique_client_hosts': '$unique_client_hosts', 'count': '$count'}},
+    ]
+
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+async def device_counts(collection, filters: dict, group_by: str, by_day: bool) -> list[dict]:
+    """
+    This function counts the public logs per device type, browser or operating system.
+
+    Parameters:
+    - collection: The MongoDB collection to aggregate.
+    - filters (dict): The filter built by log_filters (e.g. the from/to time window).
+    - group_by (str): The parsed field to group by (device_type, browser or operating_system).
+    - by_day (bool): Whether to count every day separately.
+
+    Behavior:
+    - Groups the matching logs by the field (and day) in the database.
+    - Returns a list of dictionaries with the field, count and (if by_day) day fields.
+    """
+    key = {group_by: f'${group_by}'}
+    if by_day:
+        key['day'] = {'$dateToString': {'format': '%Y-%m-%d', 'date': '$datum_vnosa'}}
+
+    pipeline = [{'$match': filters}] if filters else []
+    pipeline += [
+        {'$group': {'_id': key, 'count': {'$sum': 1}}},
+        {'$sort': {'_id.day': 1, 'count': -1}} if by_day else {'$sort': {'count': -1}},
+        {'$project': {'_id': 0, **{field: f'$_id.{field}' for field in key}, 'count': '$count'}},
+    ]
+
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+async def geo_counts(collection, filters: dict, group_by: str, top: int | None) -> list[dict]:
+    """
+    This function counts the backend logs and distinct client hosts per country or city.
+
+    Parameters:
+    - collection: The MongoDB collection to aggregate.
+    - filters (dict): The filter built by log_filters (e.g. the from/to time window).
+    - group_by (str): 'country', or 'city' to count per country and city.
+    - top (int | None): Return only the first N groups.
+
+    Behavior:
+    - Groups the logs enriched by the GeoIP job; logs not enriched yet are left out,
+      logs whose client host could not be resolved are counted with an empty country.
+    - Counts the logs per group and client host first, then the client hosts per group, so no
+      group has to hold the list of its client hosts (which may exceed the document size limit).
+    - Returns a list of dictionaries with country, (city,) count and unique_client_hosts fields, largest first.
+    """
+    key = {'country': '$country', 'city': '$city'} if group_by == 'city' else {'country': '$country'}
+
+    pipeline = [{'$match': {'$and': [filters, {'country': {'$ne': None}}]} if filters else {'country': {'$ne': None}}}]
+    pipeline += [
+        {'$group': {'_id': {**key, 'client_host': '$client_host'}, 'count': {'$sum': 1}}},
+        {'$group': {'_id': {field: f'$_id.{field}' for field in key}, 'count': {'$sum': '$count'},
+                    'unique_client_hosts': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+    ]
+    if top:
+        pipeline.append({'$limit': top})
+    pipeline.append({'$project': {'_id': 0, **{field: f'$_id.{field}' for field in key}, 'count': '$count',
+                                  'unique_client_hosts': '$unique_client_hosts'}})
+
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
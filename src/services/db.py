@@ -1,4 +1,15 @@
-from pymongo import MongoClient
+"""
+MongoDB clients of the tenants.
+
+Clients are created by connect() in the application lifespan, or lazily on first use
+(e.g. by the command line tools), and closed by close() on shutdown. Tenants on the same
+cluster (same connection string) share one client and its connection pool.
+"""
+import asyncio
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
 
 from src import env
 
@@ -7,41 +18,138 @@ from src.database.private import logging_private
 from src.database.public import logging_public
 from src.database.admin.user import user_dict
 from src.database.geo_data import geo_data_log
+from src.services.metrics import CommandStats
+from src.services.pool_stats import PoolStats
+from src.services.schema import compact
+from src.services.tenants import tenants
+from src.services.token_cache import token_cache
 
-client_hsa = MongoClient(env.DB_CONNECTION_LOGGING)
-proces_hsa = client_hsa[env.DB_PROCES]
+logger = logging.getLogger(__name__)
 
-client_portfolio_dj = MongoClient(env.DB_CONNECTION_LOGGING_PDJ)
-proces_portfolio_dj = client_portfolio_dj[env.DB_PROCESS]
 
+def create_client(connection: str, pool_stats: PoolStats) -> AsyncIOMotorClient:
+    """
+    This function creates an asynchronous MongoDB client with the pool settings from env.
 
-def drop_log():
-    proces_hsa.logging_private.drop()
-    proces_hsa.logging_public.drop()
-    proces_hsa.backend_logs.drop()
-    proces_hsa.geo_data_log.drop()
+    Behavior:
+    - Sizes the connection pool with DB_MAX_POOL_SIZE and DB_MIN_POOL_SIZE.
+    - Bounds connecting, socket reads, server selection and waiting for a pooled connection,
+      so a slow cluster fails requests instead of piling them up.
+    - Registers pool_stats as the listener of the connection pool and command_stats as the
+      listener of the commands, for the /metrics route.
+    """
+    return AsyncIOMotorClient(
+        connection,
+        maxPoolSize=env.DB_MAX_POOL_SIZE,
+        minPoolSize=env.DB_MIN_POOL_SIZE,
+        connectTimeoutMS=env.DB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=env.DB_SOCKET_TIMEOUT_MS,
+        serverSelectionTimeoutMS=env.DB_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=env.DB_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[pool_stats, command_stats],
+    )
 
-    proces_hsa.user_dict.drop()
 
-    proces_portfolio_dj.logging_private.drop()
-    proces_portfolio_dj.logging_public.drop()
-    proces_portfolio_dj.backend_logs.drop()
-    proces_portfolio_dj.geo_data_log.drop()
+# One client (and connection pool) per cluster, shared by all tenants on that cluster
+clients: dict[str, AsyncIOMotorClient] = {}
+
+# Pool statistics per cluster
+pool_stats: dict[str, PoolStats] = {}
+
+# Command latency of all clients
+command_stats = CommandStats()
+
+
+def get_client(connection: str) -> AsyncIOMotorClient:
+    if connection not in clients:
+        pool_stats[connection] = PoolStats(','.join(clusters()[connection]))
+        clients[connection] = create_client(connection, pool_stats[connection])
+    return clients[connection]
+
+
+def get_database(tenant: str):
+    """
+    This function returns the MongoDB database of a tenant, creating its client if needed.
+    """
+    return get_client(tenants[tenant].connection)[tenants[tenant].database]
+
+
+def clusters() -> dict[str, list[str]]:
+    """
+    This function groups the tenant names by connection string.
+    """
+    grouped = {}
+    for name, tenant in tenants.items():
+        grouped.setdefault(tenant.connection, []).append(name)
+    return grouped
 
-    pass
 
+async def ping(connection: str) -> bool:
+    """
+    This function checks whether a cluster answers a ping within DB_PING_TIMEOUT seconds.
+    """
+    try:
+        await asyncio.wait_for(get_client(connection).admin.command('ping'), env.DB_PING_TIMEOUT)
+        return True
+    except (PyMongoError, asyncio.TimeoutError):
+        return False
+
+
+async def connect() -> list[str]:
+    """
+    This function creates the clients of all tenants and warms them up with a ping.
+
+    Behavior:
+    - Creates one client per cluster.
+    - Pings every cluster in parallel, so connections (and DB_MIN_POOL_SIZE) are established
+      before the first request; an unreachable cluster is logged, not fatal.
+    - Returns the names of the tenants whose cluster answered.
+    """
+    grouped = clusters()
+    results = await asyncio.gather(*(ping(connection) for connection in grouped))
+
+    reachable = []
+    for (connection, tenant_names), answered in zip(grouped.items(), results):
+        if answered:
+            reachable.extend(tenant_names)
+        else:
+            logger.warning("MongoDB of tenants %s is not reachable", ', '.join(tenant_names))
+    return reachable
+
+
+def close():
+    """
+    This function closes all clients and their connection pools.
+    """
+    for client in clients.values():
+        client.close()
+    clients.clear()
+    pool_stats.clear()
+
+
+async def drop_log():
+    for name in tenants:
+        database = get_database(name)
+        await database.logging_private.drop()
+        await database.logging_public.drop()
+        await database.backend_logs.drop()
+        await database.geo_data_log.drop()
+
+    await get_database(env.AUTH_TENANT).user_dict.drop()
+    # Tokens of the dropped users must not stay valid through the cache
+    token_cache.clear()
+
+    pass
 
-def seed_log():
-    proces_hsa.logging_private.insert_many(logging_private)
-    proces_hsa.logging_public.insert_many(logging_public)
-    proces_hsa.backend_logs.insert_many(backend_logs)
-    proces_hsa.geo_data_log.insert_many(geo_data_log)
 
-    proces_hsa.user_dict.insert_many(user_dict)
+async def seed_log():
+    for name in tenants:
+        database = get_database(name)
+        await database.logging_private.insert_many([compact(document, 'logging_private') for document in logging_private])
+        await database.logging_public.insert_many([compact(document, 'logging_public') for document in logging_public])
+        await database.backend_logs.insert_many([compact(document, 'backend_logs') for document in backend_logs])
+        await database.geo_data_log.insert_many([compact(document) for document in geo_data_log])
 
-    proces_portfolio_dj.logging_private.insert_many(logging_private)
-    proces_portfolio_dj.logging_public.insert_many(logging_public)
-    proces_portfolio_dj.backend_logs.insert_many(backend_logs)
-    proces_portfolio_dj.geo_data_log.insert_many(geo_data_log)
+    await get_database(env.AUTH_TENANT).user_dict.insert_many(user_dict)
 
     pass
@@ -0,0 +1,99 @@
+"""
+Background delete jobs.
+
+POST /{tenant}/deletions queues the deletion of the logs matching a filter (before a time,
+domain, client host and/or a list of ids) on the delete JobQueue. A worker deletes them in
+chunks of DELETE_BATCH_SIZE logs, oldest first, so no single delete runs for minutes:
+- every chunk continues at the datum_vnosa of the previous one (datum_vnosa is indexed in
+  both storage modes, time-series collections have no _id index), so logs the filter does
+  not match are not scanned again,
+- at most DELETE_RATE logs are deleted per second,
+- deleting pauses while an ingest buffer is more than half full.
+
+The job reports the number of matching logs when it started and the number deleted so far.
+"""
+import asyncio
+import hashlib
+import json
+import time
+
+from src import env
+from src.api.delete_request import DeleteRequest
+from src.services import db, ingest_buffer
+from src.services.export import json_default
+from src.services.jobs import Job, JobQueue
+from src.services.pagination import log_filters
+from src.services.response_cache import response_cache
+from src.services.schema import object_id
+
+# Deletions are never deduplicated once they finished, deleting again is a new job
+delete_jobs = JobQueue(env.DELETE_WORKERS, env.DELETE_MAX_PENDING, 0, env.DELETE_RETENTION)
+
+
+def delete_filters(request: DeleteRequest) -> dict:
+    """
+    This function builds the MongoDB filter of a delete request.
+
+    Behavior:
+    - Matches the logs before `before`, of the domain and client host, and with one of the ids
+      (as string or ObjectId), for the criteria that are given.
+    """
+    query = log_filters(None, request.before, request.domain, request.client_host, None)
+    if request.ids:
+        query['_id'] = {'$in': list({value for _id in request.ids for value in (_id, object_id(_id))})}
+    return query
+
+
+def ingest_busy() -> bool:
+    return any(buffer.queue.qsize() > env.INGEST_BUFFER_SIZE // 2 for buffer in ingest_buffer.buffers.values())
+
+
+async def delete_in_chunks(collection, filters: dict, job: Job):
+    """
+    This function deletes the logs of a collection matching a filter, chunk by chunk.
+
+    Parameters:
+    - collection: The MongoDB collection.
+    - filters (dict): The filter built by delete_filters.
+    - job (Job): The job, whose total and processed counts are updated.
+
+    Behavior:
+    - Counts the matching logs first.
+    - Reads the _ids of the next DELETE_BATCH_SIZE matching logs, oldest first, and deletes them.
+    - Waits between chunks so that at most DELETE_RATE logs are deleted per second, and while
+      the ingest buffers are busy.
+    """
+    job.total = await collection.count_documents(filters)
+    since = None
+
+    while True:
+        started = time.monotonic()
+        query = filters if since is None else {'$and': [filters, {'datum_vnosa': {'$gte': since}}]}
+        cursor = collection.find(query, {'datum_vnosa': 1}).sort('datum_vnosa', 1).limit(env.DELETE_BATCH_SIZE)
+        documents = await cursor.to_list(length=env.DELETE_BATCH_SIZE)
+        if not documents:
+            return
+
+        result = await collection.delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+        job.processed += result.deleted_count
+        response_cache.bump(collection)
+        since = documents[-1]['datum_vnosa']
+
+        if env.DELETE_RATE:
+            await asyncio.sleep(max(0.0, len(documents) / env.DELETE_RATE - (time.monotonic() - started)))
+        while ingest_busy():
+            await asyncio.sleep(env.INGEST_FLUSH_INTERVAL)
+
+
+def submit_delete(tenant: str, collection_name: str, request: DeleteRequest) -> Job:
+    """
+    This function queues a delete job, or returns the queued or running job of an identical request.
+    """
+    filters = delete_filters(request)
+    key = hashlib.sha256(json.dumps([tenant, request.dict()], default=json_default, sort_keys=True).encode()).hexdigest()
+
+    async def run(job: Job):
+        await delete_in_chunks(db.get_database(tenant)[collection_name], filters, job)
+
+    info = {'tenant': tenant, 'source': request.source, 'collection': collection_name}
+    return delete_jobs.submit('delete', key, run, info)
@@ -0,0 +1,97 @@
+"""
+Device, browser and operating system of public logs.
+
+The frontends write the device into the log content ("... Device is: Desktop") and may
+include the user agent. The fields are parsed once when a log is ingested and stored
+next to the content, so device statistics are answered from an index instead of a
+regular expression over every log.
+
+Run `python -m src.services.device` once to fill the fields of logs ingested before.
+"""
+import asyncio
+import re
+
+from pymongo import UpdateOne
+
+from src.services import db
+from src.services.tenants import tenants
+
+DEVICE_PATTERN = re.compile(r'Device is:\s*(\w+)', re.IGNORECASE)
+
+# Checked in order, the first match wins (e.g. Edge user agents also contain "Chrome/")
+BROWSERS = (('Edg/', 'Edge'), ('OPR/', 'Opera'), ('Firefox/', 'Firefox'), ('Chrome/', 'Chrome'), ('Safari/', 'Safari'))
+OPERATING_SYSTEMS = (('Windows', 'Windows'), ('Android', 'Android'), ('iPhone', 'iOS'), ('iPad', 'iOS'),
+                     ('Mac OS X', 'macOS'), ('Linux', 'Linux'))
+
+
+def normalize_device_type(device_type: str) -> str:
+    return device_type.strip().capitalize()
+
+
+def parse_device(content: str) -> dict:
+    """
+    This function parses the device type, browser and operating system from log content.
+
+    Behavior:
+    - Takes the device type from "Device is: <type>" or, failing that, guesses it from a user agent.
+    - Detects the browser and operating system from user agent tokens.
+    - Returns a dictionary with device_type, browser and operating_system (None if unknown).
+    """
+    browser = next((name for token, name in BROWSERS if token in content), None)
+    operating_system = next((name for token, name in OPERATING_SYSTEMS if token in content), None)
+
+    match = DEVICE_PATTERN.search(content)
+    if match:
+        device_type = normalize_device_type(match.group(1))
+    elif 'iPad' in content or 'Tablet' in content:
+        device_type = 'Tablet'
+    elif 'Mobi' in content:
+        device_type = 'Mobile'
+    elif browser or operating_system:
+        device_type = 'Desktop'
+    else:
+        device_type = None
+
+    return {'device_type': device_type, 'browser': browser, 'operating_system': operating_system}
+
+
+def add_device(document: dict) -> dict:
+    """
+    This function adds the parsed device fields to a public log that does not have them yet.
+    """
+    if document.get('device_type') is None:
+        document.update(parse_device(document['content']))
+    return document
+
+
+async def backfill_device_types(collection, batch_size: int = 1000) -> int:
+    """
+    This function parses the device fields of the logs of a collection that were ingested without them.
+
+    Behavior:
+    - Reads the logs without a device_type field batch_size at a time.
+    - Sets the parsed fields with one unordered bulk write per batch.
+    - Returns the number of updated logs.
+    """
+    updated = 0
+    while True:
+        cursor = collection.find({'device_type': {'$exists': False}}, {'content': 1})
+        documents = await cursor.to_list(length=batch_size)
+        if not documents:
+            return updated
+
+        await collection.bulk_write(
+            [UpdateOne({'_id': document['_id']}, {'$set': parse_device(document.get('content', ''))})
+             for document in documents],
+            ordered=False)
+        updated += len(documents)
+
+
+async def backfill_all():
+    for tenant in tenants:
+        updated = await backfill_device_types(db.get_database(tenant).logging_public)
+        print(f'{tenant}: {updated} public logs updated')
+
+
+if __name__ == '__main__':
+    asyncio.run(backfill_all())
@@ -0,0 +1,264 @@
+"""
+Streaming exports of the log collections.
+
+Documents are read from a MongoDB cursor in batches and written out as newline-delimited
+JSON (NDJSON) or CSV while they are read, so the memory needed does not depend on the size
+of the collection. XLSX workbooks are written with openpyxl's write-only mode, which keeps
+the rows in a temporary file instead of memory; the finished workbook is streamed from disk.
+openpyxl is imported only when an XLSX export is requested.
+
+write_export writes the same formats (and Parquet, through pyarrow) into a file for the
+background export jobs.
+"""
+import asyncio
+import csv
+import datetime
+import io
+import json
+import tempfile
+
+from fastapi.responses import StreamingResponse
+
+from src import env
+from src.services.schema import expanded
+
+# Rows of an XLSX worksheet, including the header; further rows continue on a new worksheet
+XLSX_MAX_ROWS = 1048576
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def json_default(value):
+    """
+    This function serializes the values the json module does not know about.
+
+    Behavior:
+    - Returns datetimes in ISO 8601 format (the same format the JSON routes use).
+    - Returns every other value (e.g. ObjectId) as a string.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(documents, batch_size: int = env.EXPORT_BATCH_SIZE):
+    """
+    This generator streams documents as NDJSON.
+
+    Parameters:
+    - documents: An async iterable of documents (e.g. a MongoDB cursor).
+    - batch_size (int): How many lines are yielded per chunk.
+    """
+    lines = []
+
+    async for document in documents:
+        lines.append(json.dumps(document, default=json_default, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def ndjson_stream(collection, filters: dict, batch_size: int = env.EXPORT_BATCH_SIZE):
+    """
+    This generator streams the documents of a collection as NDJSON.
+
+    Parameters:
+    - collection: The MongoDB collection to export.
+    - filters (dict): The filter built by log_filters.
+    - batch_size (int): How many documents are fetched from MongoDB per round trip.
+
+    Behavior:
+    - Reads the matching documents in natural order, batch_size documents at a time.
+    - Yields one chunk of NDJSON lines per batch, so at most one batch is held in memory.
+    """
+    return ndjson_chunks(expanded(collection.find(filters).batch_size(batch_size)), batch_size)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (str, int, float)):
+        return value
+    return json_default(value)
+
+
+async def csv_stream(documents, columns: list[str], batch_size: int = env.EXPORT_BATCH_SIZE):
+    """
+    This generator streams documents as CSV rows.
+
+    Parameters:
+    - documents: An async iterable of documents (e.g. a MongoDB cursor).
+    - columns (list[str]): The fields written as columns, in this order.
+    - batch_size (int): How many rows are written per chunk.
+
+    Behavior:
+    - Yields the header row, then one chunk of rows per batch_size documents.
+    - Writes datetimes in ISO 8601 format and missing fields as empty cells.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+
+    async for document in documents:
+        writer.writerow([_csv_value(document.get(column)) for column in columns])
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+async def xlsx_stream(documents, columns: list[str], sheet_name: str, chunk_size: int = 64 * 1024,
+                      batch_size: int = env.EXPORT_BATCH_SIZE):
+    """
+    This generator streams documents as an XLSX workbook.
+
+    Parameters:
+    - documents: An async iterable of documents (e.g. a MongoDB cursor).
+    - columns (list[str]): The fields written as columns, in this order.
+    - sheet_name (str): Name of the worksheet.
+    - chunk_size (int): Size of the chunks the finished workbook is streamed in.
+    - batch_size (int): Number of rows appended per call in a worker thread.
+
+    Behavior:
+    - Appends the rows to a write-only workbook while the documents are read, batch_size rows
+      at a time in a worker thread, so the event loop is not blocked.
+    - Continues on a new worksheet after XLSX_MAX_ROWS rows.
+    - Saves the workbook into a temporary file and streams it from there.
+    - Memory stays bounded: write-only worksheets are written to temporary files as rows are
+      appended, and openpyxl 3.1 writes strings inline instead of into a shared strings table.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def xlsx_value(value):
+        if value is None or isinstance(value, (int, float)):
+            return value
+        if isinstance(value, datetime.datetime):
+            return value.replace(tzinfo=None)
+        return ILLEGAL_CHARACTERS_RE.sub('', value if isinstance(value, str) else json_default(value))
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    sheet.append(columns)
+    sheets, rows = 1, 1
+
+    def append(batch):
+        nonlocal sheet, sheets, rows
+        for values in batch:
+            if rows >= XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(f'{sheet_name[:27]}_{sheets}')
+                sheet.append(columns)
+                rows = 1
+            sheet.append([xlsx_value(value) for value in values])
+            rows += 1
+
+    batch = []
+    async for document in documents:
+        batch.append([document.get(column) for column in columns])
+        if len(batch) >= batch_size:
+            await asyncio.to_thread(append, batch)
+            batch = []
+    if batch:
+        await asyncio.to_thread(append, batch)
+
+    with tempfile.TemporaryFile() as file:
+        await asyncio.to_thread(workbook.save, file)
+        file.seek(0)
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+
+
+def export_response(documents, columns: list[str], name: str, export_format: str) -> StreamingResponse:
+    """
+    This function returns a streaming download of documents as CSV or XLSX.
+
+    Parameters:
+    - documents: An async iterable of documents (e.g. a MongoDB cursor).
+    - columns (list[str]): The fields written as columns.
+    - name (str): Name of the file (without extension) and of the worksheet.
+    - export_format (str): 'csv' or 'xlsx'.
+    """
+    if export_format == 'csv':
+        content = csv_stream(documents, columns)
+    else:
+        content = xlsx_stream(documents, columns, name)
+
+    return StreamingResponse(content, media_type=MEDIA_TYPES[export_format],
+                             headers={'Content-Disposition': f'attachment; filename={name}.{export_format}'})
+
+
+def _parquet_value(value):
+    if value is None or isinstance(value, (str, int, float, datetime.datetime)):
+        return value
+    return json_default(value)
+
+
+async def parquet_write(documents, columns: list[str], path: str, batch_size: int = env.EXPORT_BATCH_SIZE):
+    """
+    This function writes documents into a Parquet file, one row group per batch.
+
+    Behavior:
+    - Writes datum_vnosa as a timestamp, count as an integer and every other column as a string.
+    - Imports pyarrow only when called.
+    """
+    import pyarrow
+    import pyarrow.parquet
+
+    types = {'datum_vnosa': pyarrow.timestamp('ms'), 'count': pyarrow.int64()}
+    schema = pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in columns])
+
+    def write(writer, rows):
+        table = pyarrow.Table.from_pylist(rows, schema=schema)
+        writer.write_table(table)
+
+    writer = pyarrow.parquet.ParquetWriter(path, schema)
+    try:
+        rows = []
+        async for document in documents:
+            rows.append({column: _parquet_value(document.get(column)) for column in columns})
+            if len(rows) >= batch_size:
+                await asyncio.to_thread(write, writer, rows)
+                rows = []
+        if rows:
+            await asyncio.to_thread(write, writer, rows)
+    finally:
+        writer.close()
+
+
+async def write_export(documents, columns: list[str], name: str, export_format: str, path: str):
+    """
+    This function writes documents into an export file instead of a response.
+
+    Parameters:
+    - documents: An async iterable of documents (e.g. a MongoDB cursor).
+    - columns (list[str]): The fields written as columns (not used by NDJSON).
+    - name (str): Name of the worksheet of XLSX exports.
+    - export_format (str): 'ndjson', 'csv', 'xlsx' or 'parquet'.
+    - path (str): The file to write.
+    """
+    if export_format == 'parquet':
+        return await parquet_write(documents, columns, path)
+
+    if export_format == 'ndjson':
+        chunks = ndjson_chunks(documents)
+    elif export_format == 'csv':
+        chunks = csv_stream(documents, columns)
+    else:
+        chunks = xlsx_stream(documents, columns, name)
+
+    with open(path, 'wb') as file:
+        async for chunk in chunks:
+            await asyncio.to_thread(file.write, chunk.encode() if isinstance(chunk, str) else chunk)
@@ -0,0 +1,105 @@
+"""
+Background export jobs.
+
+POST /{tenant}/exports queues an export on the export JobQueue instead of streaming it in
+the request, so large exports do not run into proxy timeouts. A worker writes the file into
+EXPORT_SPOOL_DIR (first as <id>.<format>.part, renamed when complete) and the client
+downloads it from /exports/{id}/download once the job is done. Files are deleted when their
+job is forgotten, EXPORT_RETENTION seconds after it finished.
+"""
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+
+from fastapi import HTTPException
+
+from src import env
+from src.api.export_request import ExportRequest
+from src.services import db
+from src.services.analytics import HostStatsParams, client_host_pipeline
+from src.services.export import json_default, write_export
+from src.services.jobs import Job, JobQueue
+from src.services.pagination import SORT, log_filters
+from src.services.schema import expanded
+
+logger = logging.getLogger(__name__)
+
+
+def _delete_file(job: Job):
+    for path in (job.result, job.info.get('partial')):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+export_jobs = JobQueue(env.EXPORT_WORKERS, env.EXPORT_MAX_PENDING, env.EXPORT_CACHE_TTL, env.EXPORT_RETENTION,
+                       on_expire=_delete_file)
+
+
+async def _counted(documents, job: Job):
+    async for document in documents:
+        job.processed += 1
+        yield document
+
+
+def clean_spool():
+    """
+    This function deletes the spooled files older than EXPORT_RETENTION, e.g. of jobs lost in a restart.
+    """
+    if not os.path.isdir(env.EXPORT_SPOOL_DIR):
+        return
+    cutoff = time.time() - env.EXPORT_RETENTION
+    for name in os.listdir(env.EXPORT_SPOOL_DIR):
+        path = os.path.join(env.EXPORT_SPOOL_DIR, name)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def submit_export(tenant: str, export: ExportRequest, collection_name: str, columns: list[str]) -> Job:
+    """
+    This function queues an export job, or returns the job of an identical earlier request.
+
+    Parameters:
+    - tenant (str): Name of the tenant.
+    - export (ExportRequest): The source, format, filters and (for unique_client_hosts) ordering.
+    - collection_name (str): The collection to export (backend_logs for unique_client_hosts).
+    - columns (list[str]): The fields written as columns.
+
+    Behavior:
+    - Raises HTTPException (400) for Parquet exports if pyarrow is not installed.
+    - Deduplicates requests with the same tenant, source, format and filters within EXPORT_CACHE_TTL.
+    - The job counts the matching logs first (for unique_client_hosts the total stays unknown),
+      then reports the number of written rows as its progress.
+    """
+    if export.format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise HTTPException(status_code=400, detail="Parquet exports are not available, pyarrow is not installed")
+
+    filters = log_filters(export.date_from, export.date_to, export.domain, export.client_host, export.route_action)
+    key = hashlib.sha256(json.dumps([tenant, export.dict()], default=json_default, sort_keys=True).encode()).hexdigest()
+    name = 'unique_client_hosts' if export.source == 'unique_client_hosts' else collection_name
+
+    async def run(job: Job):
+        collection = db.get_database(tenant)[collection_name]
+
+        if export.source == 'unique_client_hosts':
+            params = HostStatsParams(export.sort_by, export.descending, export.top)
+            documents = collection.aggregate(client_host_pipeline(filters, params), allowDiskUse=True)
+        else:
+            job.total = await collection.count_documents(filters)
+            documents = expanded(collection.find(filters).sort(SORT).batch_size(env.EXPORT_BATCH_SIZE))
+
+        os.makedirs(env.EXPORT_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(env.EXPORT_SPOOL_DIR, f'{job.id}.{export.format}')
+        job.info['partial'] = path + '.part'
+        try:
+            await write_export(_counted(documents, job), columns, name, export.format, job.info['partial'])
+        except BaseException:
+            _delete_file(job)
+            raise
+        os.replace(job.info.pop('partial'), path)
+        job.result = path
+
+    info = {'tenant': tenant, 'source': export.source, 'format': export.format, 'filename': f'{name}.{export.format}'}
+    return export_jobs.submit('export', key, run, info)
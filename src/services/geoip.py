@@ -0,0 +1,267 @@
+"""
+GeoIP enrichment of the backend logs.
+
+A background job resolves the client_host of backend logs that have no country yet and
+writes country and city next to the log, so the geo statistics are plain $group
+aggregations and no IP is resolved on the request path.
+
+IPs are resolved through the resolver chosen by the extension of GEOIP_DATABASE:
+- .mmdb: a MaxMind (GeoLite2/GeoIP2 City) database, read with the maxminddb package
+- .csv: a table of networks with the columns network,country,region,city,latitude,longitude,org
+
+Every IP is resolved once: results are kept in an in-memory LRU and persisted in the
+geo_data_log collection of the tenant, which is consulted before the resolver.
+
+Run `python -m src.services.geoip` once to enrich the logs ingested before.
+"""
+import asyncio
+import bisect
+import csv
+import ipaddress
+import logging
+from collections import OrderedDict
+
+from pymongo import UpdateMany, UpdateOne
+
+from src import env
+from src.domain.geo_data import GeoData
+from src.services import db
+from src.services.response_cache import response_cache
+from src.services.schema import compact, expand
+from src.services.tenants import tenants
+
+logger = logging.getLogger(__name__)
+
+# Fields of the geo data; an IP the resolver does not know is stored with empty fields
+GEO_FIELDS = ('country', 'region', 'city', 'loc', 'org')
+UNKNOWN = dict.fromkeys(GEO_FIELDS, '')
+
+
+class MmdbResolver:
+    """
+    Resolver reading a MaxMind .mmdb database.
+    """
+
+    def __init__(self, path: str):
+        import maxminddb
+        self.reader = maxminddb.open_database(path)
+
+    def resolve(self, ip: str) -> dict | None:
+        record = self.reader.get(ip)
+        if not record:
+            return None
+
+        location = record.get('location', {})
+        subdivisions = record.get('subdivisions') or [{}]
+        traits = record.get('traits', {})
+        return {
+            'country': record.get('country', {}).get('iso_code', ''),
+            'region': subdivisions[0].get('names', {}).get('en', ''),
+            'city': record.get('city', {}).get('names', {}).get('en', ''),
+            'loc': f"{location['latitude']},{location['longitude']}" if 'latitude' in location else '',
+            'org': traits.get('autonomous_system_organization') or traits.get('organization', ''),
+        }
+
+
+class CsvResolver:
+    """
+    Resolver reading a CSV table of networks into memory, looked up by binary search.
+    """
+
+    def __init__(self, path: str):
+        # Per IP version: sorted first addresses, last addresses and records of the networks
+        self.starts = {4: [], 6: []}
+        self.ends = {4: [], 6: []}
+        self.records = {4: [], 6: []}
+
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = []
+            skipped = 0
+            for row in csv.DictReader(file):
+                # DictReader fills the columns missing in a short row with None
+                try:
+                    network = ipaddress.ip_network((row.get('network') or '').strip(), strict=False)
+                except ValueError:
+                    skipped += 1
+                    continue
+                latitude, longitude = row.get('latitude') or '', row.get('longitude') or ''
+                rows.append((network.version, int(network.network_address), int(network.broadcast_address), {
+                    'country': row.get('country') or '',
+                    'region': row.get('region') or '',
+                    'city': row.get('city') or '',
+                    'loc': f"{latitude},{longitude}" if latitude and longitude else '',
+                    'org': row.get('org') or '',
+                }))
+
+        if skipped:
+            logger.warning("Skipped %d rows of %s without a valid network", skipped, path)
+
+        for version, start, end, record in sorted(rows, key=lambda row: row[:2]):
+            self.starts[version].append(start)
+            self.ends[version].append(end)
+            self.records[version].append(record)
+
+    def resolve(self, ip: str) -> dict | None:
+        address = ipaddress.ip_address(ip)
+        version, value = address.version, int(address)
+        index = bisect.bisect_right(self.starts[version], value) - 1
+        if index >= 0 and value <= self.ends[version][index]:
+            return self.records[version][index]
+        return None
+
+
+_resolver = None
+
+
+def get_resolver():
+    """
+    This function returns the resolver of GEOIP_DATABASE, loading it on first use (None if not configured).
+    """
+    global _resolver
+    if _resolver is None and env.GEOIP_DATABASE:
+        _resolver = MmdbResolver(env.GEOIP_DATABASE) if env.GEOIP_DATABASE.endswith('.mmdb') \
+            else CsvResolver(env.GEOIP_DATABASE)
+    return _resolver
+
+
+class GeoCache:
+    """
+    Bounded LRU cache of IP -> geo data; IPs that could not be resolved are cached as None.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, ip: str):
+        self.entries.move_to_end(ip)
+        return self.entries[ip]
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.entries
+
+    def put(self, ip: str, geo: dict | None):
+        self.entries[ip] = geo
+        self.entries.move_to_end(ip)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+geo_cache = GeoCache(env.GEOIP_CACHE_SIZE)
+
+
+def _geo(document: dict) -> dict | None:
+    return {field: document.get(field, '') for field in GEO_FIELDS} if document.get('country') else None
+
+
+def _resolve_all(ips: list[str]) -> dict:
+    resolver = get_resolver()
+    resolved = {}
+    for ip in ips:
+        try:
+            resolved[ip] = resolver.resolve(ip)
+        except ValueError:
+            # client_host is not an IP address
+            resolved[ip] = None
+    return resolved
+
+
+async def lookup(database, ips: list[str]) -> dict:
+    """
+    This function returns the geo data of the given IPs, resolving each IP only once.
+
+    Parameters:
+    - database: The MongoDB database of the tenant, holding the geo_data_log cache.
+    - ips (list[str]): The IPs to look up.
+
+    Behavior:
+    - Answers from the in-memory LRU, then from geo_data_log.
+    - Resolves the remaining IPs with the resolver (in a thread) and stores the results in geo_data_log,
+      the unknown ones with empty fields, so they are not resolved again either.
+    - Returns a dictionary of IP to geo data (None for IPs the resolver does not know).
+    """
+    found = {ip: geo_cache.get(ip) for ip in ips if ip in geo_cache}
+    missing = [ip for ip in ips if ip not in found]
+
+    if missing:
+        async for document in database.geo_data_log.find({'ip': {'$in': missing}}):
+            found[document['ip']] = _geo(expand(document))
+        missing = [ip for ip in missing if ip not in found]
+
+    if missing:
+        resolved = await asyncio.to_thread(_resolve_all, missing)
+        await database.geo_data_log.bulk_write([
+            UpdateOne({'ip': ip}, {'$setOnInsert': compact(GeoData(ip=ip, **(geo or UNKNOWN)).dict(by_alias=True))},
+                      upsert=True)
+            for ip, geo in resolved.items()
+        ], ordered=False)
+        found |= {ip: _geo(geo or UNKNOWN) for ip, geo in resolved.items()}
+
+    for ip in ips:
+        geo_cache.put(ip, found[ip])
+    return found
+
+
+async def enrich_backend_logs(database, batch_size: int = env.GEOIP_BATCH_SIZE) -> int:
+    """
+    This function writes country and city into the backend logs that do not have them yet.
+
+    Behavior:
+    - Collects batch_size distinct client hosts of logs without a country at a time.
+    - Looks up their geo data and sets it with one update per client host.
+    - Sets an empty country and city for hosts that cannot be resolved, so they are not looked up again.
+    - Returns the number of updated logs.
+    """
+    collection = database.backend_logs
+    updated = 0
+
+    while True:
+        pipeline = [
+            {'$match': {'country': None}},
+            {'$group': {'_id': '$client_host'}},
+            {'$limit': batch_size},
+        ]
+        ips = [document['_id'] async for document in collection.aggregate(pipeline)]
+        if not ips:
+            return updated
+
+        geo = await lookup(database, [ip for ip in ips if ip])
+        result = await collection.bulk_write([
+            UpdateMany({'client_host': ip, 'country': None}, {'$set': {
+                'country': (geo.get(ip) or UNKNOWN)['country'],
+                'city': (geo.get(ip) or UNKNOWN)['city'],
+            }})
+            for ip in ips
+        ], ordered=False)
+        response_cache.bump(collection)
+        updated += result.modified_count
+
+
+async def run_enrichment():
+    """
+    This coroutine enriches the backend logs of every tenant every GEOIP_INTERVAL seconds until it is cancelled.
+    """
+    while True:
+        for tenant in tenants:
+            try:
+                updated = await enrich_backend_logs(db.get_database(tenant))
+                if updated:
+                    logger.info("Resolved the location of %d backend logs of %s", updated, tenant)
+            except Exception:
+                logger.exception("GeoIP enrichment of %s failed", tenant)
+
+        await asyncio.sleep(env.GEOIP_INTERVAL)
+
+
+async def enrich_all():
+    if not env.GEOIP_DATABASE:
+        print('GEOIP_DATABASE is not set')
+        return
+
+    for tenant in tenants:
+        updated = await enrich_backend_logs(db.get_database(tenant))
+        print(f'{tenant}: {updated} backend logs updated')
+
+
+if __name__ == '__main__':
+    asyncio.run(enrich_all())
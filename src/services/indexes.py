@@ -0,0 +1,253 @@
+"""
+Index registry of the log collections.
+
+INDEXES declares the indexes every collection needs; ensure_indexes creates them on
+application startup. Creating an index that already exists with the same options is a
+no-op, so running it on every start is cheap and idempotent.
+
+Log collections listed in TIMESERIES_COLLECTIONS are created as time-series collections
+(timeField datum_vnosa, metaField meta holding client_host and domain). They cannot have
+a text index, so searches fall back to regular expressions, and they expire logs with the
+expireAfterSeconds option of the collection instead of a TTL index.
+
+The 2dsphere index of the geo data (GEO_INDEX) cannot be built while an entry still has a
+loc string, so it is created separately, only with SCHEMA_VERSION 2 and once no loc string
+is left; the schema migration creates it when it is done.
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from src import env
+from src.services import db
+from src.services.retention import ttl_seconds
+from src.services.tenants import tenants
+
+logger = logging.getLogger(__name__)
+
+# Location queries of the geo data, see ensure_geo_index
+GEO_INDEX = IndexModel([('loc', GEOSPHERE)], name='loc_2dsphere')
+
+LOG_COLLECTIONS = ('logging_private', 'logging_public', 'backend_logs')
+
+# Name of the optional TTL index on datum_vnosa
+TTL_INDEX = 'datum_vnosa_ttl'
+
+LOG_INDEXES = [
+    # Newest first listing and keyset pagination, time range queries
+    IndexModel([('datum_vnosa', DESCENDING), ('_id', DESCENDING)], name='datum_vnosa_desc'),
+    # Client host grouping and filtering
+    IndexModel([('client_host', ASCENDING)], name='client_host'),
+    # Filtering by domain within a time range
+    IndexModel([('domain', ASCENDING), ('datum_vnosa', DESCENDING)], name='domain_datum_vnosa'),
+    # Full-text search of the content
+    IndexModel([('content', TEXT)], name='content_text', default_language='none'),
+]
+
+INDEXES = {
+    'logging_private': LOG_INDEXES,
+    'logging_public': LOG_INDEXES + [
+        # Device statistics
+        IndexModel([('device_type', ASCENDING), ('datum_vnosa', DESCENDING)], name='device_type_datum_vnosa'),
+    ],
+    'backend_logs': LOG_INDEXES + [
+        # Geo statistics and finding the logs the GeoIP enrichment has not resolved yet
+        IndexModel([('country', ASCENDING), ('datum_vnosa', DESCENDING)], name='country_datum_vnosa'),
+    ],
+    'geo_data_log': [
+        # Persistent GeoIP cache, one entry per IP
+        IndexModel([('ip', ASCENDING)], name='ip_unique', unique=True),
+    ],
+    'rollups': [
+        # Dashboard queries of one dimension and granularity in a time range
+        IndexModel([('collection', ASCENDING), ('dimension', ASCENDING), ('granularity', ASCENDING),
+                    ('bucket', ASCENDING)], name='rollup_lookup'),
+        # Minute and hour rollups expire, day rollups have no expires field
+        IndexModel([('expires', ASCENDING)], name='expires_ttl', expireAfterSeconds=0),
+    ],
+    'user_dict': [
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+    ],
+}
+
+
+def timeseries_indexes(indexes: list[IndexModel]) -> list[IndexModel]:
+    """
+    This function leaves out the indexes a time-series collection cannot have (text indexes).
+    """
+    return [index for index in indexes if TEXT not in index.document['key'].values()]
+
+
+async def collection_info(database, name: str) -> dict | None:
+    async for info in database.list_collections(filter={'name': name}):
+        return info
+    return None
+
+
+async def ensure_timeseries(database, name: str, seconds: int) -> bool:
+    """
+    This function creates a log collection as a time-series collection if it does not exist yet.
+
+    Parameters:
+    - database: The MongoDB database of the tenant.
+    - name (str): The log collection.
+    - seconds (int): How long logs are kept; 0 keeps them forever.
+
+    Behavior:
+    - Creates the collection with timeField datum_vnosa and metaField meta.
+    - Keeps expireAfterSeconds of an existing time-series collection in line with seconds.
+    - Returns False if the collection exists as an ordinary collection (it has to be migrated).
+    """
+    info = await collection_info(database, name)
+    if info is None:
+        options = {'timeseries': {'timeField': 'datum_vnosa', 'metaField': 'meta',
+                                  'granularity': env.TIMESERIES_GRANULARITY}}
+        if seconds:
+            options['expireAfterSeconds'] = seconds
+        try:
+            await database.create_collection(name, **options)
+            return True
+        except CollectionInvalid:
+            # Created by another worker in the meantime
+            info = await collection_info(database, name)
+
+    if info.get('type') != 'timeseries':
+        return False
+    if info['options'].get('expireAfterSeconds', 0) != seconds:
+        await database.command('collMod', name, expireAfterSeconds=seconds or 'off')
+    return True
+
+
+async def ensure_timeseries_collections(tenant_names=tuple(tenants)):
+    """
+    This function creates the missing time-series collections of the given tenants (all by default).
+
+    Behavior:
+    - Runs before the application accepts logs, so the first insert does not create an ordinary collection.
+    - Logs a warning for collections that still have to be migrated.
+    """
+    for tenant in tenant_names:
+        database = db.get_database(tenant)
+        for name in env.TIMESERIES_COLLECTIONS:
+            try:
+                if not await ensure_timeseries(database, name, ttl_seconds(tenant, name)):
+                    logger.warning("%s is not a time-series collection, run python -m src.services.timeseries",
+                                   database[name].full_name)
+            except PyMongoError:
+                logger.exception("Creating the time-series collection %s failed", database[name].full_name)
+
+
+def tenant_collections(tenant: str) -> tuple:
+    """
+    This function returns the registered collections of a tenant; only AUTH_TENANT holds the users.
+    """
+    return tuple(name for name in INDEXES if name != 'user_dict' or tenant == env.AUTH_TENANT)
+
+
+async def ensure_ttl_index(collection, seconds: int):
+    """
+    This function creates, updates or drops the TTL index on datum_vnosa.
+
+    Parameters:
+    - collection: The MongoDB collection.
+    - seconds (int): How long documents are kept; 0 drops the TTL index.
+
+    Behavior:
+    - Creates the TTL index if it does not exist yet.
+    - Changes expireAfterSeconds with collMod if the index exists with another value.
+    - Drops the index if the TTL is disabled.
+    """
+    existing = (await collection.index_information()).get(TTL_INDEX)
+
+    if not seconds:
+        if existing:
+            await collection.drop_index(TTL_INDEX)
+    elif not existing:
+        await collection.create_index([('datum_vnosa', ASCENDING)], name=TTL_INDEX, expireAfterSeconds=seconds)
+    elif existing.get('expireAfterSeconds') != seconds:
+        await collection.database.command(
+            'collMod', collection.name, index={'name': TTL_INDEX, 'expireAfterSeconds': seconds})
+
+
+async def ensure_geo_index(collection):
+    """
+    This function creates the 2dsphere index on loc once the geo data is stored in the compact schema.
+
+    Behavior:
+    - Does nothing with SCHEMA_VERSION 1 or while an entry still has a loc string.
+    """
+    if env.SCHEMA_VERSION < 2:
+        return
+    if await collection.find_one({'loc': {'$type': 'string'}}, {'_id': 1}):
+        logger.info("Not creating %s on %s before the loc strings are migrated (python -m src.services.migration)",
+                    GEO_INDEX.document['name'], collection.full_name)
+        return
+    await collection.create_indexes([GEO_INDEX])
+
+
+async def ensure_indexes(tenant: str, database, collections=tuple(INDEXES)):
+    """
+    This function creates the registered indexes of the given collections of a database.
+
+    Parameters:
+    - tenant (str): Name of the tenant, used to look up its retention policies.
+    - database: The MongoDB database of the tenant.
+    - collections: Names of the collections to index (all registered collections by default).
+
+    Behavior:
+    - Creates the indexes declared in INDEXES; existing indexes are left as they are.
+    - Keeps the TTL index of the log collections in line with their retention policy; time-series
+      collections get no text index and keep their expireAfterSeconds in line instead.
+    - Creates the 2dsphere index of the geo data separately (ensure_geo_index), so it cannot keep the
+      other indexes from being created.
+    - Logs the failure and continues with the next collection if an index cannot be created,
+      so an unreachable database does not prevent the application from starting.
+    """
+    for name in collections:
+        collection = database[name]
+        try:
+            timeseries = name in env.TIMESERIES_COLLECTIONS and \
+                await ensure_timeseries(database, name, ttl_seconds(tenant, name))
+            await collection.create_indexes(timeseries_indexes(INDEXES[name]) if timeseries else INDEXES[name])
+            if name in LOG_COLLECTIONS and not timeseries:
+                await ensure_ttl_index(collection, ttl_seconds(tenant, name))
+        except PyMongoError:
+            logger.exception("Creating indexes of %s failed", collection.full_name)
+
+        if name == 'geo_data_log':
+            try:
+                await ensure_geo_index(collection)
+            except PyMongoError:
+                logger.exception("Creating the 2dsphere index of %s failed", collection.full_name)
+
+
+async def index_stats(database, collections=tuple(INDEXES)) -> dict:
+    """
+    This function reports how often every index of the given collections was used.
+
+    Behavior:
+    - Runs the $indexStats aggregation on every collection.
+    - Returns a dictionary of collection name to a list of index name, key, operations and since.
+    """
+    stats = {}
+    for name in collections:
+        cursor = database[name].aggregate([{'$indexStats': {}}])
+        stats[name] = [
+            {
+                'name': index['name'],
+                'key': index['key'],
+                'ops': index['accesses']['ops'],
+                'since': index['accesses']['since'],
+            }
+            async for index in cursor
+        ]
+    return stats
+
+
+async def bootstrap_indexes(tenant_names=tuple(tenants)):
+    """
+    This function creates the registered indexes in the databases of the given tenants (all by default).
+    """
+    for tenant in tenant_names:
+        await ensure_indexes(tenant, db.get_database(tenant), tenant_collections(tenant))
@@ -0,0 +1,104 @@
+"""
+Batched ingest of logs.
+
+A batch is a JSON array or an NDJSON body of log records. Every record is validated on
+its own and the valid ones are written with a single unordered insert_many, so one bad
+record neither rejects the batch nor stops the records after it.
+"""
+import json
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from src import env
+from src.services.response_cache import response_cache
+from src.services.schema import compact
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+async def read_batch(request: Request) -> list:
+    """
+    This function reads the records of a batch from the request body.
+
+    Behavior:
+    - Parses an NDJSON body line by line; a line that is not valid JSON is kept as a string,
+      so it is reported as a failed item instead of failing the whole batch.
+    - Parses any other body as a JSON array.
+    - Raises HTTPException (400) if the body is not a JSON array.
+    - Raises HTTPException (413) if the batch holds more than INGEST_MAX_BATCH records.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+
+    if content_type in NDJSON_TYPES:
+        items = []
+        for line in (await request.body()).decode().splitlines():
+            if line.strip():
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    items.append(line)
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+    if len(items) > env.INGEST_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {env.INGEST_MAX_BATCH} records")
+
+    return items
+
+
+async def insert_batch(collection, model, items: list, prepare=None, on_inserted=None) -> dict:
+    """
+    This function validates a batch of records and writes the valid ones to a collection.
+
+    Parameters:
+    - collection: The MongoDB collection to write to.
+    - model: The domain model every record is validated against.
+    - items (list): The records read by read_batch.
+    - prepare: Optional function that completes a validated document before it is written.
+    - on_inserted: Optional function called with every written document (e.g. to publish it to the live tail).
+
+    Behavior:
+    - Validates every record against the model and reports the invalid ones by index.
+    - Writes all valid records, in the stored form of SCHEMA_VERSION, with one unordered insert_many.
+    - Reports records the database rejected (e.g. duplicate _id) by their index in the batch.
+    - Returns a dictionary with the number of inserted records and the list of errors.
+    """
+    documents, positions, errors = [], [], []
+
+    for index, item in enumerate(items):
+        try:
+            document = model.parse_obj(item).dict(by_alias=True)
+            documents.append(prepare(document) if prepare else document)
+            positions.append(index)
+        except ValidationError as error:
+            errors.append({'index': index, 'error': error.errors()})
+
+    inserted_count = 0
+    rejected = set()
+    if documents:
+        try:
+            result = await collection.insert_many([compact(document, collection.name) for document in documents],
+                                                  ordered=False)
+            inserted_count = len(result.inserted_ids)
+        except BulkWriteError as error:
+            inserted_count = error.details['nInserted']
+            for write_error in error.details['writeErrors']:
+                rejected.add(write_error['index'])
+                errors.append({'index': positions[write_error['index']], 'error': write_error['errmsg']})
+        if inserted_count:
+            response_cache.bump(collection)
+
+    if on_inserted:
+        for index, document in enumerate(documents):
+            if index not in rejected:
+                on_inserted(document)
+
+    errors.sort(key=lambda error: error['index'])
+    return {'inserted_count': inserted_count, 'errors': errors}
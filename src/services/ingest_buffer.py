@@ -0,0 +1,176 @@
+"""
+Write-behind buffer for the single log POST routes.
+
+A POST route only puts the log on an in-memory queue and returns. A background task per
+collection writes the queued logs with insert_many as soon as INGEST_FLUSH_SIZE logs are
+waiting or INGEST_FLUSH_INTERVAL seconds have passed, whichever comes first. The queue is
+bounded by INGEST_BUFFER_SIZE (plus the batch being flushed); when it is full the routes
+answer 429 so clients back off instead of the worker running out of memory.
+
+The clients were already answered, so a batch is not given up on a transient error (e.g. a
+replica set failover): the flush is retried up to INGEST_RETRY_ATTEMPTS times with a backoff
+doubling from INGEST_RETRY_BACKOFF seconds. Only the documents MongoDB rejects (writeErrors
+of a BulkWriteError) or a batch that still fails after the retries are dropped and counted.
+"""
+import asyncio
+import logging
+
+from fastapi import HTTPException
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+from src import env
+from src.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the queue when the buffer is drained
+_STOP = object()
+
+DUPLICATE_KEY = 11000
+
+
+def transient(error: PyMongoError) -> bool:
+    # Network errors, server selection timeouts and "not primary" are ConnectionFailures
+    return isinstance(error, ConnectionFailure) or error.has_error_label('RetryableWriteError')
+
+
+class IngestBuffer:
+    """
+    Bounded queue of documents waiting to be written to one collection.
+    """
+
+    def __init__(self, collection):
+        acknowledged = collection.name not in env.INGEST_UNACKNOWLEDGED
+        self.collection = collection.with_options(write_concern=WriteConcern(w=1 if acknowledged else 0))
+        self.queue = asyncio.Queue(maxsize=env.INGEST_BUFFER_SIZE)
+        self.task = None
+        self.closing = False
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, document: dict):
+        """
+        This method queues a document without waiting for the database.
+
+        Behavior:
+        - Starts the flush task on first use.
+        - Raises HTTPException (503) if the buffer is being drained for shutdown.
+        - Raises HTTPException (429) if the queue is full.
+        """
+        if self.closing:
+            raise HTTPException(status_code=503, detail="Shutting down, log not accepted")
+
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+        try:
+            self.queue.put_nowait(document)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=429, detail="Ingest buffer is full, retry later",
+                                headers={"Retry-After": str(max(1, round(env.INGEST_FLUSH_INTERVAL)))})
+
+    async def _run(self):
+        while True:
+            # An unexpected error must not end the task, the queue would fill up and every POST get 429
+            try:
+                if await self._next_batch():
+                    return
+            except Exception:
+                logger.exception("Ingest buffer of %s failed", self.collection.full_name)
+
+    async def _next_batch(self) -> bool:
+        """
+        This method waits for the next batch of documents and writes it; returns True once the buffer is drained.
+        """
+        loop = asyncio.get_running_loop()
+
+        document = await self.queue.get()
+        if document is _STOP:
+            return True
+
+        # Collect documents until the batch is full or the flush interval is over
+        batch = [document]
+        deadline = loop.time() + env.INGEST_FLUSH_INTERVAL
+        stop = False
+        while len(batch) < env.INGEST_FLUSH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                document = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if document is _STOP:
+                stop = True
+                break
+            batch.append(document)
+
+        await self._flush(batch)
+        return stop
+
+    async def _flush(self, batch: list):
+        """
+        This method writes a batch, retrying transient errors with a growing backoff.
+
+        Behavior:
+        - Drops only the documents MongoDB rejects; after a retry, duplicate key errors are documents
+          the failed attempt already wrote, so they count as written.
+        - Drops the batch if it still fails after INGEST_RETRY_ATTEMPTS retries.
+        """
+        for attempt in range(env.INGEST_RETRY_ATTEMPTS + 1):
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                break
+            except BulkWriteError as error:
+                # With ordered=False every document without a write error was written
+                errors = error.details['writeErrors']
+                rejected = [write_error for write_error in errors if not (attempt and write_error['code'] == DUPLICATE_KEY)]
+                self.written += len(batch) - len(rejected)
+                self.failed += len(rejected)
+                if rejected:
+                    logger.error("%d of %d logs were rejected by %s: %s", len(rejected), len(batch),
+                                 self.collection.full_name, rejected[0]['errmsg'])
+                break
+            except PyMongoError as error:
+                if not transient(error) or attempt == env.INGEST_RETRY_ATTEMPTS:
+                    self.failed += len(batch)
+                    logger.error("Flushing %d logs to %s failed: %s", len(batch), self.collection.full_name, error)
+                    break
+                delay = env.INGEST_RETRY_BACKOFF * 2 ** attempt
+                logger.warning("Flushing %d logs to %s failed, retrying in %.1f s: %s",
+                               len(batch), self.collection.full_name, delay, error)
+                await asyncio.sleep(delay)
+        response_cache.bump(self.collection)
+
+    async def drain(self):
+        """
+        This method writes every queued document and stops the flush task.
+        """
+        self.closing = True
+        if self.task is not None:
+            await self.queue.put(_STOP)
+            await self.task
+
+
+# One buffer per collection, keyed by the full collection name
+buffers: dict[str, IngestBuffer] = {}
+
+
+def enqueue(collection, document: dict):
+    """
+    This function queues a document for the buffer of its collection.
+    """
+    buffer = buffers.get(collection.full_name)
+    if buffer is None:
+        buffer = buffers[collection.full_name] = IngestBuffer(collection)
+    buffer.submit(document)
+
+
+async def drain_all():
+    """
+    This function drains every ingest buffer; it runs when the application shuts down.
+    """
+    await asyncio.gather(*(buffer.drain() for buffer in buffers.values()))
+    buffers.clear()
@@ -0,0 +1,157 @@
+"""
+In-process background jobs.
+
+A JobQueue runs submitted jobs on a fixed number of asyncio worker tasks, so long running
+work (e.g. exports) is not bound to the request that started it. Clients poll the status
+of a job by its id. Jobs with the same key are deduplicated: while a job is queued or
+running, or finished less than cache_ttl seconds ago, submitting the same key returns it
+instead of starting a new one. Finished jobs are forgotten after `retention` seconds.
+
+Jobs live in the memory of the worker process; they are lost when the process restarts.
+"""
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    State and progress of one background job.
+    """
+
+    def __init__(self, kind: str, key: str, run, info: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.run = run
+        self.info = info
+        self.status = 'queued'
+        self.processed = 0
+        self.total = None
+        self.error = None
+        # Set by run, e.g. the path of the produced file
+        self.result = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'error': self.error,
+            'created': datetime.datetime.fromtimestamp(self.created),
+            'finished': datetime.datetime.fromtimestamp(self.finished) if self.finished else None,
+            'info': self.info,
+        }
+
+
+class JobQueue:
+    """
+    Bounded queue of jobs and the worker tasks running them.
+    """
+
+    def __init__(self, workers: int, max_pending: int, cache_ttl: int, retention: int, on_expire=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_ttl = cache_ttl
+        self.retention = retention
+        # Called with every job that is forgotten, e.g. to delete its file
+        self.on_expire = on_expire
+        self.jobs: dict[str, Job] = {}
+        self.queue = None
+        self.tasks = []
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def _find(self, key: str, now: float) -> Job | None:
+        for job in self.jobs.values():
+            if job.key != key:
+                continue
+            if job.status in ('queued', 'running'):
+                return job
+            if job.status == 'done' and job.finished > now - self.cache_ttl:
+                return job
+        return None
+
+    def _expire(self, now: float):
+        for job in list(self.jobs.values()):
+            if job.finished and job.finished <= now - self.retention:
+                del self.jobs[job.id]
+                if self.on_expire:
+                    self.on_expire(job)
+
+    def submit(self, kind: str, key: str, run, info: dict) -> Job:
+        """
+        This method queues a job, or returns the job of an identical earlier request.
+
+        Parameters:
+        - kind (str): The kind of job, e.g. 'export'.
+        - key (str): Identifies identical requests.
+        - run: Coroutine function called with the job; it updates processed/total and sets result.
+        - info (dict): Description of the job reported with its status.
+
+        Behavior:
+        - Forgets finished jobs older than the retention.
+        - Returns the queued, running or recently finished job with the same key, if there is one.
+        - Raises HTTPException (429) if max_pending jobs are already waiting.
+        - Starts the worker tasks on first use.
+        """
+        now = time.time()
+        self._expire(now)
+
+        job = self._find(key, now)
+        if job:
+            return job
+
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+        if self.queue.qsize() >= self.max_pending:
+            raise HTTPException(status_code=429, detail="Too many pending jobs, retry later", headers={"Retry-After": "60"})
+
+        job = Job(kind, key, run, info)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            try:
+                await job.run(job)
+                job.status = 'done'
+            except asyncio.CancelledError:
+                job.status, job.error = 'failed', "Interrupted by shutdown"
+                raise
+            except Exception as error:
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                job.status, job.error = 'failed', str(error)
+            finally:
+                job.finished = time.time()
+
+    async def shutdown(self):
+        """
+        This method stops the worker tasks; running and queued jobs are marked as failed.
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        for job in self.jobs.values():
+            if job.status == 'queued':
+                job.status, job.error, job.finished = 'failed', "Interrupted by shutdown", time.time()
+
+        self.queue = None
+        self.tasks = []
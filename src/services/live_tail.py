@@ -0,0 +1,221 @@
+"""
+Live tail of new logs.
+
+The POST routes publish every accepted log to an in-process broker, which fans it out to
+the subscribers of its tenant and collection whose filters match (evaluated here with
+matches_filters, so clients only receive what they asked for). The /tail routes stream
+the received logs to the clients over Server-Sent Events or a WebSocket.
+
+Every subscriber has a bounded queue of LIVE_TAIL_QUEUE_SIZE logs. A subscriber that does
+not keep up loses the oldest queued logs and is told how many it lost, so one slow client
+never blocks the POST routes or grows the memory of the worker.
+
+With LIVE_TAIL_SOURCE=change_stream the broker is fed by MongoDB change streams instead
+(one per watched collection while it has subscribers), so logs written by other workers or
+other services are tailed too. Change streams need a replica set; time-series collections
+have none, their logs are always published by the POST routes.
+"""
+import asyncio
+import json
+import logging
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pymongo.errors import PyMongoError
+
+from src import env
+from src.services import db
+from src.services.export import json_default
+from src.services.pagination import matches_filters
+from src.services.schema import expand
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    Bounded queue of the logs waiting to be sent to one client.
+    """
+
+    def __init__(self, filters: dict):
+        self.filters = filters
+        self.queue = asyncio.Queue(maxsize=env.LIVE_TAIL_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, document: dict):
+        if not matches_filters(document, self.filters):
+            return
+        if self.queue.full():
+            # Drop the oldest log, the client is more interested in the current ones
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(document)
+
+    async def next_event(self, timeout: float) -> dict | None:
+        """
+        This method waits for the next log; returns None if none arrived within timeout seconds.
+
+        Behavior:
+        - Returns {'dropped': n} first if logs were dropped since the last event.
+        """
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {'dropped': dropped}
+        try:
+            return {'log': await asyncio.wait_for(self.queue.get(), timeout)}
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """
+    Subscribers per (tenant, collection) and the fan-out of published logs.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[tuple, set[Subscriber]] = {}
+        self.watchers: dict[tuple, asyncio.Task] = {}
+
+    def count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def subscribe(self, tenant: str, collection: str, filters: dict) -> Subscriber:
+        """
+        This method registers a subscriber; raises HTTPException (503) if LIVE_TAIL_MAX_SUBSCRIBERS are connected.
+        """
+        if self.count() >= env.LIVE_TAIL_MAX_SUBSCRIBERS:
+            raise HTTPException(status_code=503, detail="Too many live tail subscribers, retry later")
+
+        key = (tenant, collection)
+        subscriber = Subscriber(filters)
+        self.subscribers.setdefault(key, set()).add(subscriber)
+
+        if self.watched(collection) and key not in self.watchers:
+            self.watchers[key] = asyncio.create_task(self._watch(tenant, collection))
+        return subscriber
+
+    def unsubscribe(self, tenant: str, collection: str, subscriber: Subscriber):
+        # Idempotent, the SSE generator and the background task of its response both call it
+        key = (tenant, collection)
+        subscribers = self.subscribers.get(key, set())
+        subscribers.discard(subscriber)
+
+        if not subscribers:
+            self.subscribers.pop(key, None)
+            watcher = self.watchers.pop(key, None)
+            if watcher:
+                watcher.cancel()
+
+    @staticmethod
+    def watched(collection: str) -> bool:
+        return env.LIVE_TAIL_SOURCE == 'change_stream' and collection not in env.TIMESERIES_COLLECTIONS
+
+    def _fan_out(self, key: tuple, document: dict):
+        for subscriber in self.subscribers.get(key, ()):
+            # A failing subscriber must never fail the POST route that published the log
+            try:
+                subscriber.offer(document)
+            except Exception:
+                logger.exception("Sending a log to a live tail subscriber of %s/%s failed", *key)
+
+    def publish(self, tenant: str, collection: str, document: dict):
+        """
+        This method sends a log accepted by a POST route to the matching subscribers.
+
+        Behavior:
+        - Does nothing if change streams are the source, they deliver the log once it is written.
+        """
+        if not self.watched(collection):
+            self._fan_out((tenant, collection), document)
+
+    async def _watch(self, tenant: str, collection: str):
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        while True:
+            try:
+                async with db.get_database(tenant)[collection].watch(pipeline) as stream:
+                    async for change in stream:
+                        self._fan_out((tenant, collection), expand(change['fullDocument']))
+            except PyMongoError:
+                logger.exception("Change stream of %s/%s failed, restarting", tenant, collection)
+                await asyncio.sleep(env.LIVE_TAIL_HEARTBEAT)
+
+    async def shutdown(self):
+        for watcher in self.watchers.values():
+            watcher.cancel()
+        await asyncio.gather(*self.watchers.values(), return_exceptions=True)
+        self.watchers.clear()
+
+
+broker = Broker()
+
+
+def sse_stream(tenant: str, collection: str, filters: dict, request) -> StreamingResponse:
+    """
+    This function subscribes to the new logs of a collection that match the filters and returns
+    a response streaming them as Server-Sent Events.
+
+    Behavior:
+    - Subscribes before the response starts, so too many subscribers are answered with 503.
+    - Sends every log as a "log" event and lost logs of a slow client as a "dropped" event.
+    - Sends a comment every LIVE_TAIL_HEARTBEAT seconds without logs, which keeps proxies from
+      closing the connection and notices clients that went away.
+    - Unsubscribes when the client disconnects, also if it disconnects before the first event
+      (the generator never starts then, the background task of the response unsubscribes).
+    """
+    subscriber = broker.subscribe(tenant, collection, filters)
+
+    async def events():
+        try:
+            yield ': connected\n\n'
+            while not await request.is_disconnected():
+                event = await subscriber.next_event(env.LIVE_TAIL_HEARTBEAT)
+                if event is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                name, data = next(iter(event.items()))
+                yield f'event: {name}\ndata: {json.dumps(data, default=json_default, ensure_ascii=False)}\n\n'
+        finally:
+            broker.unsubscribe(tenant, collection, subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+                             background=BackgroundTask(broker.unsubscribe, tenant, collection, subscriber))
+
+
+async def websocket_stream(tenant: str, collection: str, filters: dict, websocket: WebSocket):
+    """
+    This function sends the new logs of a collection that match the filters over a WebSocket.
+
+    Behavior:
+    - Closes the connection with 1013 (try again later) if too many subscribers are connected.
+    - Sends every log as {"log": ...}, lost logs of a slow client as {"dropped": n} and
+      {"heartbeat": true} every LIVE_TAIL_HEARTBEAT seconds without logs.
+    - Ignores messages of the client and unsubscribes when it disconnects.
+    """
+    try:
+        subscriber = broker.subscribe(tenant, collection, filters)
+    except HTTPException:
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    receive = asyncio.create_task(websocket.receive())
+    event = asyncio.create_task(subscriber.next_event(env.LIVE_TAIL_HEARTBEAT))
+    try:
+        while True:
+            done, _ = await asyncio.wait({receive, event}, return_when=asyncio.FIRST_COMPLETED)
+            if receive in done:
+                if receive.result()['type'] == 'websocket.disconnect':
+                    return
+                receive = asyncio.create_task(websocket.receive())
+            if event in done:
+                message = event.result() or {'heartbeat': True}
+                await websocket.send_text(json.dumps(message, default=json_default, ensure_ascii=False))
+                event = asyncio.create_task(subscriber.next_event(env.LIVE_TAIL_HEARTBEAT))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive.cancel()
+        event.cancel()
+        broker.unsubscribe(tenant, collection, subscriber)
@@ -0,0 +1,132 @@
+"""
+Login throttling and latency statistics.
+
+Failed logins are counted per username and per client IP in a sliding window. Once a key
+has LOGIN_MAX_FAILURES failures within LOGIN_FAILURE_WINDOW seconds, further attempts are
+rejected with 429 before any password is hashed, so credential stuffing cannot keep the
+password verification pool busy.
+
+Behind a proxy every connection comes from the proxy, so the client IP is read from the
+X-Forwarded-For hop the last of TRUSTED_PROXY_HOPS proxies appended (client_ip); earlier
+entries are set by the client and cannot be trusted.
+
+The keys are kept in the order of their last failure: keys whose last failure is outside the
+window are forgotten from the front, and beyond LOGIN_MAX_KEYS keys the oldest are evicted,
+so neither memory nor the work per attempt grows with the number of attacking IPs.
+"""
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException, Request, status
+
+from src import env
+
+# Upper bounds in seconds of the login latency histogram
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def client_ip(request: Request) -> str:
+    """
+    This function returns the IP of the client, behind TRUSTED_PROXY_HOPS proxies the one they appended to X-Forwarded-For.
+    """
+    client_host = request.client.host if request.client else "unknown"
+    if env.TRUSTED_PROXY_HOPS <= 0:
+        return client_host
+
+    hops = [hop.strip() for hop in request.headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+    return hops[-env.TRUSTED_PROXY_HOPS] if len(hops) >= env.TRUSTED_PROXY_HOPS else client_host
+
+
+class LoginThrottle:
+    """
+    Sliding window of failed login timestamps per username and per client IP.
+    """
+
+    def __init__(self, max_failures: int, window: int, max_keys: int):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        # Ordered by the last failure, oldest first
+        self.failures: OrderedDict[str, deque] = OrderedDict()
+
+    def _recent(self, key: str, now: float) -> deque | None:
+        timestamps = self.failures.get(key)
+        if timestamps is None:
+            return None
+        while timestamps and timestamps[0] <= now - self.window:
+            timestamps.popleft()
+        if not timestamps:
+            del self.failures[key]
+            return None
+        return timestamps
+
+    def _prune(self, now: float):
+        # Forget the keys whose last failure is outside the window; they are at the front
+        while self.failures:
+            key, timestamps = next(iter(self.failures.items()))
+            if timestamps and timestamps[-1] > now - self.window:
+                break
+            del self.failures[key]
+
+    def check(self, username: str, client_host: str):
+        """
+        This method raises HTTPException (429) if the username or the client IP has too many recent failures.
+        """
+        now = time.time()
+        self._prune(now)
+        for key in (f'user:{username}', f'ip:{client_host}'):
+            timestamps = self._recent(key, now)
+            if timestamps is not None and len(timestamps) >= self.max_failures:
+                retry_after = int(timestamps[0] + self.window - now) + 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many failed login attempts, retry later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+    def failed(self, username: str, client_host: str):
+        now = time.time()
+        for key in (f'user:{username}', f'ip:{client_host}'):
+            self.failures.setdefault(key, deque(maxlen=self.max_failures)).append(now)
+            self.failures.move_to_end(key)
+        self._prune(now)
+        while len(self.failures) > self.max_keys:
+            self.failures.popitem(last=False)
+
+    def succeeded(self, username: str):
+        self.failures.pop(f'user:{username}', None)
+
+
+class LoginStats:
+    """
+    Counters and latency histogram of the login route.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.failures = 0
+        self.throttled = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, success: bool):
+        self.attempts += 1
+        if not success:
+            self.failures += 1
+        self.latency_sum += seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[index] += 1
+
+    def stats(self) -> dict:
+        return {
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'throttled': self.throttled,
+            'latency_avg': self.latency_sum / self.attempts if self.attempts else 0.0,
+            'latency_buckets': {f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)},
+        }
+
+
+login_throttle = LoginThrottle(env.LOGIN_MAX_FAILURES, env.LOGIN_FAILURE_WINDOW, env.LOGIN_MAX_KEYS)
+login_stats = LoginStats()
@@ -0,0 +1,215 @@
+"""
+Metrics of the service in the Prometheus text exposition format.
+
+The metrics are kept in memory per worker process and rendered by the /metrics route:
+- request latency per route operation_id, method and status (MetricsMiddleware)
+- requests in flight
+- MongoDB command latency per database, collection and command (CommandStats)
+- MongoDB connection pool wait time and connections per cluster (PoolStats)
+- logs ingested per tenant and kind of logs
+- queued and dropped logs of the ingest buffers, token cache and login counters
+- lookups, hit ratio and size of the response cache
+
+PyMongo calls the listeners on its own threads, so the metrics are guarded by a lock.
+"""
+import threading
+import time
+
+from pymongo import monitoring
+
+# Upper bounds in seconds of the latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    """
+    Monotonic counter per combination of label values.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, labels: tuple = (), value: float = 0):
+        # Used for values counted elsewhere (e.g. the token cache) and copied when the metrics are rendered
+        with self.lock:
+            self.values[labels] = value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, labels, value) for labels, value in self.values.items()]
+
+    def label_names(self, sample_name: str) -> tuple:
+        return self.labels
+
+
+class Gauge(Counter):
+    """
+    Value per combination of label values that can go up and down.
+    """
+
+    type = 'gauge'
+
+
+class Histogram(Counter):
+    """
+    Cumulative histogram of observations per combination of label values.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, labels: tuple, value: float):
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                # One count per bucket, then +Inf, then the sum
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self.lock:
+            values = [(labels, list(counts)) for labels, counts in self.values.items()]
+
+        samples = []
+        for labels, counts in values:
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                samples.append((f'{self.name}_bucket', labels + (bound,), count))
+            samples.append((f'{self.name}_count', labels, counts[-2]))
+            samples.append((f'{self.name}_sum', labels, counts[-1]))
+        return samples
+
+    def label_names(self, sample_name: str) -> tuple:
+        return self.labels + ('le',) if sample_name.endswith('_bucket') else self.labels
+
+
+request_latency = Histogram('http_request_duration_seconds', "Latency of the HTTP requests until the response is sent",
+                            ('operation_id', 'method', 'status'))
+requests_in_flight = Gauge('http_requests_in_flight', "HTTP requests being handled")
+mongo_command_latency = Histogram('mongodb_command_duration_seconds', "Latency of the MongoDB commands",
+                                  ('database', 'collection', 'command'))
+mongo_command_failures = Counter('mongodb_command_failures_total', "Failed MongoDB commands",
+                                 ('database', 'collection', 'command'))
+pool_wait = Histogram('mongodb_pool_wait_seconds', "Time waited for a pooled MongoDB connection", ('tenants',))
+pool_connections = Gauge('mongodb_pool_connections', "Connections of the MongoDB pool by state", ('tenants', 'state'))
+logs_ingested = Counter('logs_ingested_total', "Logs accepted by the POST routes", ('tenant', 'kind'))
+ingest_queued = Gauge('ingest_buffer_queued_logs', "Logs waiting in the ingest buffer", ('collection',))
+ingest_dropped = Counter('ingest_buffer_dropped_logs_total', "Logs of the ingest buffer that could not be written",
+                         ('collection',))
+token_cache_lookups = Counter('token_cache_lookups_total', "Lookups in the token cache by result", ('result',))
+login_attempts = Counter('login_attempts_total', "Login attempts by result", ('result',))
+response_cache_lookups = Counter('response_cache_lookups_total', "Lookups in the response cache by result", ('result',))
+response_cache_not_modified = Counter('response_cache_not_modified_total', "Requests answered with 304 Not Modified")
+response_cache_hit_ratio = Gauge('response_cache_hit_ratio', "Share of the response cache lookups that were hits")
+response_cache_entries = Gauge('response_cache_entries', "Responses in the response cache")
+
+REGISTRY = (request_latency, requests_in_flight, mongo_command_latency, mongo_command_failures, pool_wait,
+            pool_connections, logs_ingested, ingest_queued, ingest_dropped, token_cache_lookups, login_attempts,
+            response_cache_lookups, response_cache_not_modified, response_cache_hit_ratio, response_cache_entries)
+
+
+def render() -> str:
+    """
+    This function renders all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_labels(metric.label_names(name), labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class CommandStats(monitoring.CommandListener):
+    """
+    Command listener recording the latency of the MongoDB commands per collection.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_commands: dict[tuple, str] = {}
+
+    @staticmethod
+    def _collection(event) -> str:
+        # The collection is the value of the command name (find, insert, aggregate, ...),
+        # getMore names it in a separate field
+        if event.command_name == 'getMore':
+            return str(event.command.get('collection', ''))
+        value = event.command.get(event.command_name)
+        return value if isinstance(value, str) else ''
+
+    def started(self, event):
+        with self.lock:
+            self.started_commands[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def _finished(self, event) -> tuple:
+        with self.lock:
+            collection = self.started_commands.pop((event.connection_id, event.request_id), '')
+        return event.database_name, collection, event.command_name
+
+    def succeeded(self, event):
+        mongo_command_latency.observe(self._finished(event), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._finished(event)
+        mongo_command_latency.observe(labels, event.duration_micros / 1e6)
+        mongo_command_failures.inc(labels)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every request by the operation_id of its route.
+
+    The latency is measured until the response is complete, so streamed exports count
+    with their full duration.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.inc(amount=-1)
+            # The router stores the matched route in the scope
+            route = scope.get('route')
+            operation_id = getattr(route, 'operation_id', None) or getattr(route, 'name', None) or 'unmatched'
+            request_latency.observe((operation_id, scope['method'], status), time.perf_counter() - start)
@@ -0,0 +1,151 @@
+"""
+Online migration of the logs and the geo data to the compact schema (SCHEMA_VERSION 2).
+
+The migration runs while the API is in use, MIGRATION_BATCH_SIZE documents at a time with
+a pause of MIGRATION_PAUSE seconds between batches:
+1. Documents with a string _id are rewritten with an ObjectId _id. The _id of a document
+   cannot be changed, so every batch is inserted with the new _ids first and the originals
+   are deleted afterwards; until then a document may be listed twice. Geo data entries are
+   deleted first, the unique index on ip does not allow two copies.
+2. Coded domains stored as text and loc strings are converted in place.
+
+Progress is saved per collection in the migrations collection of the tenant after every
+batch, so an interrupted migration continues where it stopped; running it again is a no-op.
+Afterwards the indexes are created again, among them the 2dsphere index on loc.
+
+Run `python -m src.services.migration [tenant ...]` (all tenants by default).
+"""
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src import env
+from src.services import db
+from src.services.indexes import ensure_indexes
+from src.services.schema import compact, parse_loc
+from src.services.tenants import tenants
+
+DUPLICATE_KEY = 11000
+
+# Collections with a unique index that does not allow both copies of a document at once; their
+# originals are deleted before the copies are inserted (an entry lost in between is resolved again)
+DELETE_FIRST = ('geo_data_log',)
+
+# Collections to migrate and the query of their documents with fields in the old format
+MIGRATED_COLLECTIONS = {
+    'logging_private': lambda: {'domain': {'$in': list(env.DOMAIN_CODES)}},
+    'logging_public': lambda: {'domain': {'$in': list(env.DOMAIN_CODES)}},
+    'backend_logs': lambda: {'domain': {'$in': list(env.DOMAIN_CODES)}},
+    'geo_data_log': lambda: {'loc': {'$type': 'string'}},
+}
+
+
+async def convert_ids(database, name: str) -> int:
+    """
+    This function rewrites the documents of a collection that have a string _id with an ObjectId _id.
+
+    Behavior:
+    - Reads the documents in _id order, continuing after the last _id saved in the migrations collection.
+    - Inserts every batch in its compact form, then deletes the originals (the other way round
+      for DELETE_FIRST collections); documents an earlier, interrupted run already inserted are only deleted.
+    - Leaves documents whose _id is not an ObjectId string as they are.
+    - Returns the number of rewritten documents.
+    """
+    collection = database[name]
+    state_id = f'schema|{name}'
+    state = await database.migrations.find_one({'_id': state_id}) or {}
+    last_id = state.get('last_id')
+    converted = 0
+
+    while True:
+        query = {'_id': {'$type': 'string'}}
+        if last_id is not None:
+            query['_id']['$gt'] = last_id
+        documents = await collection.find(query).sort('_id', 1).to_list(length=env.MIGRATION_BATCH_SIZE)
+        if not documents:
+            return converted
+
+        moved = [compact(document, name) for document in documents]
+        moved = [document for document in moved if not isinstance(document['_id'], str)]
+        if moved:
+            originals = {'_id': {'$in': [str(document['_id']) for document in moved]}}
+            if name in DELETE_FIRST:
+                await collection.delete_many(originals)
+            try:
+                await collection.insert_many(moved, ordered=False)
+            except BulkWriteError as error:
+                if any(write_error['code'] != DUPLICATE_KEY for write_error in error.details['writeErrors']):
+                    raise
+            if name not in DELETE_FIRST:
+                await collection.delete_many(originals)
+
+        last_id = documents[-1]['_id']
+        converted += len(moved)
+        await database.migrations.update_one(
+            {'_id': state_id},
+            {'$set': {'version': env.SCHEMA_VERSION, 'last_id': last_id}, '$inc': {'converted': len(moved)}},
+            upsert=True)
+        await asyncio.sleep(env.MIGRATION_PAUSE)
+
+
+async def convert_fields(database, name: str) -> int:
+    """
+    This function converts the coded domains and loc strings of a collection in place.
+
+    Behavior:
+    - Reads batches of documents with fields in the old format and sets the compact values
+      with one unordered bulk write per batch, until no such document is left.
+    - Returns the number of updated documents.
+    """
+    collection = database[name]
+    updated = 0
+
+    while True:
+        cursor = collection.find(MIGRATED_COLLECTIONS[name](), {'domain': 1, 'loc': 1})
+        documents = await cursor.to_list(length=env.MIGRATION_BATCH_SIZE)
+        if not documents:
+            return updated
+
+        requests = []
+        for document in documents:
+            if name == 'geo_data_log':
+                requests.append(UpdateOne({'_id': document['_id'], 'loc': document['loc']},
+                                          {'$set': {'loc': parse_loc(document['loc'])}}))
+            else:
+                requests.append(UpdateOne({'_id': document['_id'], 'domain': document['domain']},
+                                          {'$set': {'domain': env.DOMAIN_CODES[document['domain']]}}))
+        result = await collection.bulk_write(requests, ordered=False)
+        updated += result.modified_count
+        await asyncio.sleep(env.MIGRATION_PAUSE)
+
+
+async def migrate_tenant(tenant: str) -> dict:
+    """
+    This function migrates the collections of a tenant and creates their indexes again.
+
+    Behavior:
+    - Returns a dictionary of collection name to the number of rewritten and updated documents.
+    """
+    database = db.get_database(tenant)
+    report = {}
+    for name in MIGRATED_COLLECTIONS:
+        report[name] = {'converted': await convert_ids(database, name), 'updated': await convert_fields(database, name)}
+
+    await ensure_indexes(tenant, database, tuple(MIGRATED_COLLECTIONS))
+    return report
+
+
+async def migrate_all(tenant_names):
+    if env.SCHEMA_VERSION < 2:
+        print('SCHEMA_VERSION is 1, nothing to migrate')
+        return
+
+    for tenant in tenant_names:
+        for name, counts in (await migrate_tenant(tenant)).items():
+            print(f"{tenant}/{name}: {counts['converted']} _ids converted, {counts['updated']} documents updated")
+
+
+if __name__ == '__main__':
+    asyncio.run(migrate_all(sys.argv[1:] or tuple(tenants)))
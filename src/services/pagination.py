@@ -0,0 +1,199 @@
+"""
+Keyset pagination, filtering and projection for the log collections.
+
+Logs are returned newest first, ordered by (datum_vnosa, _id). Instead of skipping
+documents, every page ends with an opaque cursor that encodes the sort key of its last
+document, so fetching page N costs the same as fetching the first one.
+"""
+import base64
+import datetime
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+
+from src import env
+from src.services.schema import domain_condition, expand
+
+# Sort order shared by the query and the cursor condition
+SORT = [('datum_vnosa', -1), ('_id', -1)]
+
+
+def encode_cursor(document: dict) -> str:
+    """
+    This function encodes the sort key of a document into an opaque cursor.
+
+    Parameters:
+    - document (dict): The last document of a page.
+
+    Behavior:
+    - Serializes datum_vnosa and _id of the document (marking ObjectIds) and encodes them as URL-safe base64.
+    """
+    key = [document['datum_vnosa'].isoformat(), str(document['_id'])]
+    if isinstance(document['_id'], ObjectId):
+        key.append('oid')
+    payload = json.dumps(key)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, str | ObjectId]:
+    """
+    This function decodes a cursor created by encode_cursor.
+
+    Behavior:
+    - Returns the datum_vnosa and _id the cursor points to.
+    - Raises HTTPException (400) if the cursor is malformed.
+    """
+    try:
+        datum_vnosa, _id, *kind = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(datum_vnosa), ObjectId(_id) if kind == ['oid'] else _id
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """
+    This function converts a timezone-aware datetime into naive UTC, the form MongoDB returns; naive ones stay as they are.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def log_filters(
+        date_from: datetime.datetime | None = Query(None, alias="from", description="Only logs from this time on"),
+        date_to: datetime.datetime | None = Query(None, alias="to", description="Only logs before this time"),
+        domain: str | None = Query(None, description="Only logs of this domain"),
+        client_host: str | None = Query(None, description="Only logs of this client host"),
+        route_action: str | None = Query(None, description="Only logs of this route action")) -> dict:
+    """
+    This dependency builds a MongoDB filter from the common log query parameters.
+
+    Behavior:
+    - Restricts datum_vnosa to the [from, to) interval if any of the bounds is given;
+      bounds with a time zone (e.g. ...Z) are converted to naive UTC.
+    - Adds an equality condition for every other parameter that is given; a domain matches
+      both its text and its code (see src/services/schema.py).
+    """
+    query = {}
+
+    if date_from or date_to:
+        query['datum_vnosa'] = {}
+        if date_from:
+            query['datum_vnosa']['$gte'] = naive_utc(date_from)
+        if date_to:
+            query['datum_vnosa']['$lt'] = naive_utc(date_to)
+
+    if domain is not None:
+        query['domain'] = domain_condition(domain)
+    for field, value in (('client_host', client_host), ('route_action', route_action)):
+        if value is not None:
+            query[field] = value
+
+    return query
+
+
+class PageParams:
+    """
+    Dependency holding the cursor, page size and projection of a list request.
+    """
+
+    def __init__(
+            self,
+            cursor: str | None = Query(None, description="Cursor returned as next_cursor by the previous page"),
+            limit: int = Query(env.PAGE_SIZE_DEFAULT, ge=1, le=env.PAGE_SIZE_MAX, description="Page size"),
+            fields: str | None = Query(None, description="Comma separated list of fields to return")):
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+
+
+def projection(model, fields: list[str] | None) -> dict | None:
+    """
+    This function builds the projection of the requested fields of a model.
+
+    Behavior:
+    - Returns None (all fields) if no fields are requested.
+    - Always includes datum_vnosa (and _id), which the cursors are built from.
+    - Raises HTTPException (400) for fields the model does not have.
+    """
+    if not fields:
+        return None
+
+    allowed = {field.alias for field in model.__fields__.values()}
+    unknown = set(fields) - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return dict.fromkeys(fields, 1) | {'datum_vnosa': 1}
+
+
+async def find_page(collection, model, filters: dict, page: PageParams) -> dict:
+    """
+    This function reads one page of logs from a collection.
+
+    Parameters:
+    - collection: The MongoDB collection to read from.
+    - model: The domain model of the collection, used to validate the projected fields.
+    - filters (dict): The filter built by log_filters.
+    - page (PageParams): The cursor, page size and projection of the request.
+
+    Behavior:
+    - Continues after the document the cursor points to, if a cursor is given.
+    - Projects the documents to the requested fields (datum_vnosa and _id are always included).
+    - Fetches one document more than requested to find out whether there is a next page.
+    - Returns a dictionary with the items (in the API format) and the cursor of the next page
+      (None on the last page).
+    """
+    query = filters
+
+    if page.cursor:
+        datum_vnosa, _id = decode_cursor(page.cursor)
+        after_cursor = {'$or': [
+            {'datum_vnosa': {'$lt': datum_vnosa}},
+            {'datum_vnosa': datum_vnosa, '_id': {'$lt': _id}},
+        ]}
+        if isinstance(_id, ObjectId):
+            # String _ids of documents not migrated yet sort below every ObjectId
+            after_cursor['$or'].append({'datum_vnosa': datum_vnosa, '_id': {'$type': 'string'}})
+        query = {'$and': [filters, after_cursor]} if filters else after_cursor
+
+    cursor = collection.find(query, projection(model, page.fields)).sort(SORT).limit(page.limit + 1)
+    documents = await cursor.to_list(length=page.limit + 1)
+
+    next_cursor = encode_cursor(documents[page.limit - 1]) if len(documents) > page.limit else None
+    return {'items': [expand(document) for document in documents[:page.limit]], 'next_cursor': next_cursor}
+
+
+def matches_filters(document: dict, filters: dict) -> bool:
+    """
+    This function evaluates a filter built by log_filters against a document in Python.
+
+    Parameters:
+    - document (dict): The log; datum_vnosa may be a datetime or an ISO 8601 string.
+    - filters (dict): The filter built by log_filters.
+
+    Behavior:
+    - Returns True if the document lies in the from/to interval and all equality (or $in) conditions hold.
+    """
+    for field, condition in filters.items():
+        value = document.get(field)
+
+        if field == 'datum_vnosa':
+            if isinstance(value, str):
+                # Python 3.10 does not parse the Z suffix
+                value = datetime.datetime.fromisoformat(value.removesuffix('Z') + ('+00:00' if value.endswith('Z') else ''))
+            if value is None:
+                return False
+            value = naive_utc(value)
+            if '$gte' in condition and value < naive_utc(condition['$gte']):
+                return False
+            if '$lt' in condition and value >= naive_utc(condition['$lt']):
+                return False
+        elif isinstance(condition, dict):
+            if value not in condition['$in']:
+                return False
+        elif value != condition:
+            return False
+
+    return True
@@ -0,0 +1,114 @@
+"""
+Connection pool statistics of the MongoDB clients.
+
+PoolStats is a PyMongo connection pool listener; one instance is registered per client and
+counts the connections of that client's pools (one pool per server of the cluster).
+The callbacks run on the driver's threads, so the counters are guarded by a lock.
+The time a check out waits for a connection is recorded in the pool_wait metric.
+
+DB_MAX_POOL_SIZE limits every pool separately, so the checked out and waiting connections
+are also counted per server, which tells whether one of the pools is saturated.
+"""
+import threading
+import time
+
+from pymongo import monitoring
+
+from src.services.metrics import pool_wait
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counters of open, checked out and waiting connections of one client.
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.lock = threading.Lock()
+        # Start of the check out in progress on the current thread
+        self.check_out = threading.local()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+        # Checked out and waiting connections per server address
+        self.servers: dict[tuple, list[int]] = {}
+
+    def _server(self, event) -> list[int]:
+        return self.servers.setdefault(event.address, [0, 0])
+
+    def saturated(self, max_pool_size: int) -> list[str]:
+        """
+        This method returns the servers whose max_pool_size connections are all checked out while requests wait.
+        """
+        with self.lock:
+            return [f'{host}:{port}' for (host, port), (checked_out, waiting) in self.servers.items()
+                    if checked_out >= max_pool_size and waiting > 0]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'open': self.open,
+                'checked_out': self.checked_out,
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'cleared': self.cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.cleared += 1
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.servers.pop(event.address, None)
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self.check_out.start = time.perf_counter()
+        with self.lock:
+            self.waiting += 1
+            self._server(event)[1] += 1
+
+    def connection_check_out_failed(self, event):
+        self.check_out.start = None
+        with self.lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+            self._server(event)[1] -= 1
+
+    def connection_checked_out(self, event):
+        start, self.check_out.start = getattr(self.check_out, 'start', None), None
+        if start is not None:
+            pool_wait.observe((self.name,), time.perf_counter() - start)
+        with self.lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            server = self._server(event)
+            server[0] += 1
+            server[1] -= 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out -= 1
+            self._server(event)[0] -= 1
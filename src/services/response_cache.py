@@ -0,0 +1,152 @@
+"""
+Cache of the responses of the read routes, validated with ETags.
+
+Dashboards poll the list and statistics routes every few seconds, although the logs rarely
+change between two polls. Every collection has a write version in this worker, which the
+routes and services writing to it increase (bump). A response is cached under its path and
+query string together with the versions of the collections it was computed from, and served
+from the cache until one of them changes or RESPONSE_CACHE_TTL seconds have passed:
+- every response carries a strong ETag (a hash of its body) and a Cache-Control header,
+- a request with the current ETag in If-None-Match is answered with 304 Not Modified,
+- at most RESPONSE_CACHE_SIZE responses of up to RESPONSE_CACHE_MAX_BODY bytes are kept,
+  the least recently used are removed first.
+
+The versions are kept per worker process, so writes through another worker or documents
+removed by a TTL index are only seen once the entry expires.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from src import env
+from src.services.serialization import dumps
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of request -> (versions, expiry, ETag, body), with the write version of every collection.
+    """
+
+    def __init__(self, max_size: int, ttl: int, max_body: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_body = max_body
+        self.entries = OrderedDict()
+        self.versions: dict[tuple, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def _name(collection) -> tuple:
+        return collection.database.name, collection.name
+
+    def bump(self, collection):
+        """
+        This method increases the write version of a collection, which invalidates the responses computed from it.
+        """
+        name = self._name(collection)
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    def version(self, collections: tuple) -> tuple:
+        return tuple(self.versions.get(self._name(collection), 0) for collection in collections)
+
+    def get(self, key: str, versions: tuple) -> tuple | None:
+        """
+        This method returns the cached (ETag, body) of a request, or None if it is not cached, outdated or expired.
+        """
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] != versions or entry[1] <= time.time():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2], entry[3]
+
+    def put(self, key: str, versions: tuple, etag: str, body: bytes):
+        """
+        This method caches the body of a response computed at the given collection versions.
+        """
+        if self.max_size <= 0 or len(body) > self.max_body:
+            return
+
+        self.entries[key] = (versions, time.time() + self.ttl, etag, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'bytes': sum(len(entry[3]) for entry in self.entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(env.RESPONSE_CACHE_SIZE, env.RESPONSE_CACHE_TTL, env.RESPONSE_CACHE_MAX_BODY)
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, current: str) -> bool:
+    """
+    This function checks an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires).
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or current in tags
+
+
+def cache_control() -> str:
+    # Without a max-age the clients revalidate every time, which costs a 304 while nothing changed
+    if env.RESPONSE_CACHE_MAX_AGE > 0:
+        return f'private, max-age={env.RESPONSE_CACHE_MAX_AGE}'
+    return 'private, no-cache'
+
+
+async def cached_response(request: Request, collections: tuple, compute) -> Response:
+    """
+    This function answers a read request from the response cache, or computes and caches its response.
+
+    Parameters:
+    - request (Request): The request; its path and query string are the key of the cache.
+    - collections (tuple): The collections the response is computed from.
+    - compute: Function returning an awaitable of the content of the response.
+
+    Behavior:
+    - Serves the cached body while none of the collections was written since it was computed.
+    - Otherwise computes the content and encodes it with orjson, like RawJSONResponse.
+    - Answers 304 Not Modified without a body if If-None-Match has the ETag of the response.
+    """
+    key = f'{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}'
+    versions = response_cache.version(collections)
+
+    cached = response_cache.get(key, versions)
+    if cached is None:
+        body = dumps(await compute())
+        cached = etag(body), body
+        response_cache.put(key, versions, *cached)
+
+    headers = {'ETag': cached[0], 'Cache-Control': cache_control()}
+    if etag_matches(request.headers.get('if-none-match'), cached[0]):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(cached[1], media_type='application/json', headers=headers)
@@ -0,0 +1,210 @@
+"""
+Retention of the log collections.
+
+RETENTION_POLICIES decides per tenant and collection how long logs stay in MongoDB:
+- mode "ttl": MongoDB deletes logs older than `days` through a TTL index on datum_vnosa.
+- mode "archive": a background job moves logs older than `days` into compressed NDJSON
+  files on local disk, one file per day: ARCHIVE_DIR/<tenant>/<collection>/<YYYY-MM-DD>.ndjson.gz
+Collections without a policy fall back to LOG_TTL_DAYS.
+
+Every run of the job appends a new compressed member (gzip) or frame (zstd) to the day
+file, so files never have to be rewritten. Logs are deleted from MongoDB only after their
+file was flushed to disk; if the worker dies in between, they are archived again on the
+next run (at least once).
+"""
+import asyncio
+import datetime
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+
+from src import env
+from src.services import db
+from src.services.export import json_default
+from src.services.pagination import matches_filters, naive_utc
+from src.services.response_cache import response_cache
+from src.services.schema import expand
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+
+
+def policy(tenant: str, collection: str) -> dict | None:
+    """
+    This function returns the retention policy of a collection of a tenant, if there is one.
+    """
+    return env.RETENTION_POLICIES.get(tenant, {}).get(collection)
+
+
+def ttl_seconds(tenant: str, collection: str) -> int:
+    """
+    This function returns the expireAfterSeconds of the TTL index of a collection.
+
+    Behavior:
+    - Returns the policy's days in seconds for a "ttl" policy.
+    - Returns 0 (no TTL index) for an "archive" policy, the archive job removes the logs.
+    - Returns LOG_TTL_DAYS in seconds for collections without a policy.
+    """
+    collection_policy = policy(tenant, collection)
+    if collection_policy is None:
+        return env.LOG_TTL_DAYS * 24 * 60 * 60
+    if collection_policy['mode'] == 'ttl':
+        return int(collection_policy['days'] * 24 * 60 * 60)
+    return 0
+
+
+def archive_dir(tenant: str, collection: str) -> str:
+    return os.path.join(env.ARCHIVE_DIR, tenant, collection)
+
+
+def _append(path: str, lines: list[str]):
+    """
+    This function appends NDJSON lines to an archive file as one compressed member.
+    """
+    data = ('\n'.join(lines) + '\n').encode()
+
+    if path.endswith(EXTENSIONS['zstd']):
+        import zstandard
+        data = zstandard.ZstdCompressor().compress(data)
+    else:
+        data = gzip.compress(data)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _read_lines(path: str):
+    """
+    This generator yields the NDJSON lines of an archive file.
+    """
+    if path.endswith(EXTENSIONS['zstd']):
+        import zstandard
+        with open(path, 'rb') as file:
+            with zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True) as reader:
+                yield from io.TextIOWrapper(reader, encoding='utf-8')
+    else:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            yield from file
+
+
+async def archive_collection(tenant: str, collection, days: float) -> int:
+    """
+    This function moves the logs older than `days` from a collection into the archive.
+
+    Parameters:
+    - tenant (str): Name of the tenant the collection belongs to.
+    - collection: The MongoDB collection.
+    - days (float): Age in days after which logs are archived.
+
+    Behavior:
+    - Reads the expired logs oldest first, ARCHIVE_BATCH_SIZE at a time.
+    - Appends every batch to the files of the days it covers, then deletes it from the collection.
+    - Returns the number of archived logs.
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    extension = EXTENSIONS[env.ARCHIVE_COMPRESSION]
+    archived = 0
+
+    while True:
+        cursor = collection.find({'datum_vnosa': {'$lt': cutoff}}).sort('datum_vnosa', 1)
+        documents = await cursor.to_list(length=env.ARCHIVE_BATCH_SIZE)
+        if not documents:
+            return archived
+
+        ids = [document['_id'] for document in documents]
+        for day, group in itertools.groupby(documents, key=lambda document: document['datum_vnosa'].date()):
+            path = os.path.join(archive_dir(tenant, collection.name), day.isoformat() + extension)
+            lines = [json.dumps(expand(document), default=json_default, ensure_ascii=False) for document in group]
+            await asyncio.to_thread(_append, path, lines)
+
+        await collection.delete_many({'_id': {'$in': ids}})
+        response_cache.bump(collection)
+        archived += len(documents)
+
+
+async def run_retention():
+    """
+    This coroutine runs the archive job every RETENTION_INTERVAL seconds until it is cancelled.
+    """
+    while True:
+        for tenant, policies in env.RETENTION_POLICIES.items():
+            for name, collection_policy in policies.items():
+                if collection_policy['mode'] != 'archive':
+                    continue
+                try:
+                    archived = await archive_collection(tenant, db.get_database(tenant)[name], collection_policy['days'])
+                    if archived:
+                        logger.info("Archived %d logs of %s/%s", archived, tenant, name)
+                except Exception:
+                    # Also settings errors (e.g. zstd without the zstandard package), the next run tries again
+                    logger.exception("Archiving %s/%s failed", tenant, name)
+
+        await asyncio.sleep(env.RETENTION_INTERVAL)
+
+
+def check_compression() -> bool:
+    """
+    This function logs a warning and returns False if ARCHIVE_COMPRESSION cannot be used.
+    """
+    if env.ARCHIVE_COMPRESSION not in EXTENSIONS:
+        logger.warning("ARCHIVE_COMPRESSION %r is not one of %s, no logs are archived",
+                       env.ARCHIVE_COMPRESSION, ', '.join(EXTENSIONS))
+        return False
+    if env.ARCHIVE_COMPRESSION == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("ARCHIVE_COMPRESSION is zstd but the zstandard package is not installed, no logs are archived")
+            return False
+    return True
+
+
+def has_archive_policies() -> bool:
+    return any(collection_policy['mode'] == 'archive'
+               for policies in env.RETENTION_POLICIES.values() for collection_policy in policies.values())
+
+
+def read_archive(tenant: str, collection: str, filters: dict):
+    """
+    This generator streams the archived logs of a collection that match the filters as NDJSON.
+
+    Parameters:
+    - tenant (str): Name of the tenant.
+    - collection (str): Name of the collection.
+    - filters (dict): The filter built by log_filters.
+
+    Behavior:
+    - Skips the day files outside the from/to interval without opening them.
+    - Evaluates the remaining conditions on every archived log.
+    - Yields chunks of matching NDJSON lines, oldest day first.
+    """
+    directory = archive_dir(tenant, collection)
+    if not os.path.isdir(directory):
+        return
+
+    bounds = filters.get('datum_vnosa', {})
+    lines = []
+
+    for name in sorted(os.listdir(directory)):
+        day = datetime.datetime.fromisoformat(name.split('.')[0])
+        if '$gte' in bounds and day + datetime.timedelta(days=1) <= naive_utc(bounds['$gte']):
+            continue
+        if '$lt' in bounds and day >= naive_utc(bounds['$lt']):
+            continue
+
+        for line in _read_lines(os.path.join(directory, name)):
+            if matches_filters(json.loads(line), filters):
+                lines.append(line if line.endswith('\n') else line + '\n')
+            if len(lines) >= env.EXPORT_BATCH_SIZE:
+                yield ''.join(lines)
+                lines = []
+
+    if lines:
+        yield ''.join(lines)
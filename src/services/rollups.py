@@ -0,0 +1,215 @@
+"""
+Pre-aggregated log counts (rollups) for the dashboards.
+
+A background job counts the logs of every collection per minute, hour and day, in total
+and per domain, route_action, client_host (and device_type of public logs), and keeps the
+counts in the rollups collection of the tenant. Dashboards read a few rollup documents
+instead of aggregating the raw logs.
+
+The job catches up from a high-watermark on datum_vnosa: every run aggregates the logs
+between the watermark and now - ROLLUP_LAG (whole minutes, at most ROLLUP_WINDOW seconds
+per step) with a $group in MongoDB, adds the counts to the rollup documents with $inc
+upserts and advances the watermark. Logs that arrive with a datum_vnosa older than
+the watermark (more than ROLLUP_LAG seconds late) are not counted.
+
+Applying a step twice (e.g. when the worker dies before the watermark is saved) does not
+count twice: every rollup document remembers the last step it was incremented by and the
+$inc only matches documents whose step is older; the upsert of an already incremented
+document fails with a duplicate key error, which is ignored.
+
+Minute and hour rollups expire after ROLLUP_MINUTE_DAYS and ROLLUP_HOUR_DAYS (TTL index on
+`expires`), day rollups are kept.
+"""
+import asyncio
+import datetime
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src import env
+from src.services import db
+from src.services.schema import domain_name
+from src.services.tenants import tenants
+
+logger = logging.getLogger(__name__)
+
+# Fields counted per collection, besides the total
+DIMENSIONS = {
+    'logging_private': ('domain', 'route_action', 'client_host'),
+    'logging_public': ('domain', 'route_action', 'client_host', 'device_type'),
+    'backend_logs': ('domain', 'route_action', 'client_host'),
+}
+
+# Start of the bucket of a minute per granularity
+GRANULARITIES = {
+    'minute': lambda minute: minute,
+    'hour': lambda minute: minute.replace(minute=0),
+    'day': lambda minute: minute.replace(hour=0, minute=0),
+}
+
+DUPLICATE_KEY = 11000
+
+
+def floor_minute(value: datetime.datetime) -> datetime.datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+async def minute_counts(collection, dimension: str, start: datetime.datetime, end: datetime.datetime):
+    """
+    This generator yields the number of logs per minute (and value of the dimension) in [start, end).
+    """
+    key = {'minute': {'$dateToString': {'format': '%Y-%m-%dT%H:%M', 'date': '$datum_vnosa'}}}
+    if dimension != 'total':
+        key['value'] = f'${dimension}'
+
+    pipeline = [
+        {'$match': {'datum_vnosa': {'$gte': start, '$lt': end}}},
+        {'$group': {'_id': key, 'count': {'$sum': 1}}},
+    ]
+    async for row in collection.aggregate(pipeline, allowDiskUse=True):
+        value = domain_name(row['_id'].get('value')) if dimension == 'domain' else row['_id'].get('value')
+        yield datetime.datetime.fromisoformat(row['_id']['minute']), '' if value is None else str(value), row['count']
+
+
+async def roll_up_window(database, name: str, start: datetime.datetime, end: datetime.datetime) -> int:
+    """
+    This function adds the counts of the logs of a collection in [start, end) to the rollups.
+
+    Behavior:
+    - Counts the logs per minute for the total and every dimension of the collection.
+    - Sums the minute counts into their minute, hour and day rollups.
+    - Increments every rollup with one unordered bulk write; rollups already incremented by
+      this step are left as they are.
+    - Returns the number of rollup documents written.
+    """
+    counts = {}
+    fields = {}
+    # Days the rollups of a granularity are kept (None: forever)
+    retention = {'minute': env.ROLLUP_MINUTE_DAYS, 'hour': env.ROLLUP_HOUR_DAYS, 'day': None}
+    now = datetime.datetime.now()
+
+    for dimension in ('total',) + DIMENSIONS[name]:
+        async for minute, value, count in minute_counts(database[name], dimension, start, end):
+            for granularity, truncate in GRANULARITIES.items():
+                bucket = truncate(minute)
+                days = retention[granularity]
+                if days and bucket + datetime.timedelta(days=days) <= now:
+                    # Already expired, e.g. minute rollups when old logs are rolled up for the first time
+                    continue
+                key = f'{name}|{dimension}|{granularity}|{bucket.isoformat()}|{value}'
+                counts[key] = counts.get(key, 0) + count
+                if key not in fields:
+                    fields[key] = {'collection': name, 'dimension': dimension, 'granularity': granularity,
+                                   'bucket': bucket, 'value': value,
+                                   'expires': bucket + datetime.timedelta(days=days) if days else None}
+
+    requests = [
+        UpdateOne({'_id': key, 'window': {'$lt': start}},
+                  {'$inc': {'count': count}, '$set': {'window': start}, '$setOnInsert': fields[key]},
+                  upsert=True)
+        for key, count in counts.items()
+    ]
+    for index in range(0, len(requests), env.ROLLUP_WRITE_BATCH):
+        try:
+            await database.rollups.bulk_write(requests[index:index + env.ROLLUP_WRITE_BATCH], ordered=False)
+        except BulkWriteError as error:
+            # Rollups already incremented by this step
+            if any(write_error['code'] != DUPLICATE_KEY for write_error in error.details['writeErrors']):
+                raise
+
+    return len(requests)
+
+
+async def catch_up(database, name: str) -> int:
+    """
+    This function rolls up the logs of a collection from its watermark up to now - ROLLUP_LAG.
+
+    Behavior:
+    - Starts at the oldest log if the collection was never rolled up.
+    - Skips time ranges without logs and rolls up at most ROLLUP_WINDOW seconds per step.
+    - Saves the watermark after every step.
+    - Returns the number of rollup documents written.
+    """
+    collection = database[name]
+    state_id = f'watermark|{name}'
+    limit = floor_minute(datetime.datetime.now() - datetime.timedelta(seconds=env.ROLLUP_LAG))
+
+    state = await database.rollups.find_one({'_id': state_id})
+    start = state['watermark'] if state else datetime.datetime.min
+    written = 0
+
+    while start < limit:
+        # Jump over the time without logs
+        following = await collection.find_one({'datum_vnosa': {'$gte': start, '$lt': limit}},
+                                               {'datum_vnosa': 1}, sort=[('datum_vnosa', 1)])
+        if following is None:
+            start = limit
+        else:
+            start = max(start, floor_minute(following['datum_vnosa']))
+            end = min(start + datetime.timedelta(seconds=env.ROLLUP_WINDOW), limit)
+            written += await roll_up_window(database, name, start, end)
+            start = end
+
+        await database.rollups.update_one({'_id': state_id}, {'$set': {'watermark': start}}, upsert=True)
+
+    return written
+
+
+async def run_rollups():
+    """
+    This coroutine catches up the rollups of every tenant every ROLLUP_INTERVAL seconds until it is cancelled.
+    """
+    while True:
+        for tenant in tenants:
+            for name in DIMENSIONS:
+                try:
+                    await catch_up(db.get_database(tenant), name)
+                except Exception:
+                    # Also malformed rows, the watermark stays and the next run tries again
+                    logger.exception("Rolling up %s/%s failed", tenant, name)
+
+        await asyncio.sleep(env.ROLLUP_INTERVAL)
+
+
+async def read_rollups(database, name: str, dimension: str, granularity: str, date_from: datetime.datetime | None,
+                       date_to: datetime.datetime | None, value: str | None, totals: bool) -> list[dict]:
+    """
+    This function reads the rollups of a collection.
+
+    Parameters:
+    - database: The MongoDB database of the tenant.
+    - name (str): The log collection.
+    - dimension (str): 'total' or one of the dimensions of the collection.
+    - granularity (str): 'minute', 'hour' or 'day'.
+    - date_from, date_to: Only buckets starting in [from, to).
+    - value (str | None): Only the rollups of this value of the dimension.
+    - totals (bool): Sum the buckets per value instead of returning every bucket.
+
+    Behavior:
+    - Returns a list of dictionaries with bucket, value and count fields, oldest bucket first,
+      or with value and count fields, largest count first, if totals is set.
+    """
+    query = {'collection': name, 'dimension': dimension, 'granularity': granularity}
+    if date_from or date_to:
+        query['bucket'] = {}
+        if date_from:
+            query['bucket']['$gte'] = date_from
+        if date_to:
+            query['bucket']['$lt'] = date_to
+    if value is not None:
+        query['value'] = value
+
+    if totals:
+        pipeline = [
+            {'$match': query},
+            {'$group': {'_id': '$value', 'count': {'$sum': '$count'}}},
+            {'$sort': {'count': -1, '_id': 1}},
+            {'$project': {'_id': 0, 'value': '$_id', 'count': '$count'}},
+        ]
+        return await database.rollups.aggregate(pipeline).to_list(length=None)
+
+    cursor = database.rollups.find(query, {'_id': 0, 'bucket': 1, 'value': 1, 'count': 1}).sort(
+        [('bucket', 1), ('value', 1)])
+    return [{'bucket': row['bucket'].isoformat(), 'value': row['value'], 'count': row['count']}
+            async for row in cursor]
@@ -0,0 +1,135 @@
+"""
+Storage schema of the logs and the geo data.
+
+SCHEMA_VERSION 1 stores the documents as the domain models produce them: _id as a
+24 character string, loc as a "latitude,longitude" string and domain as text.
+SCHEMA_VERSION 2 (the default) stores them compactly:
+- _id as a native 12 byte ObjectId,
+- loc as a GeoJSON point, indexed with a 2dsphere index,
+- domain as the small integer code DOMAIN_CODES assigns to it (domains without a code stay text).
+
+The API keeps accepting and returning the string formats: compact converts a validated
+document right before it is written, expand converts a stored document of either version
+back, and the filters match both versions, so the collections can be migrated while they
+are in use (python -m src.services.migration).
+
+Codes in DOMAIN_CODES must never be changed or reused, only added.
+
+Logs of time-series collections (TIMESERIES_COLLECTIONS) also carry a copy of client_host
+and domain in their meta field, which MongoDB stores once per bucket; the fields stay at the
+top level, so queries and aggregations do not depend on the storage mode.
+"""
+from bson import ObjectId
+
+from src import env
+
+# Domain of every code
+DOMAIN_NAMES = {code: name for name, code in env.DOMAIN_CODES.items()}
+
+
+def object_id(value):
+    """
+    This function converts a 24 character hex string into an ObjectId; other values are returned as they are.
+    """
+    return ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else value
+
+
+def id_condition(_id: str):
+    """
+    This function builds the condition matching an _id given by the API in both schema versions.
+    """
+    converted = object_id(_id)
+    return {'$in': [converted, _id]} if converted is not _id else _id
+
+
+def domain_condition(domain: str):
+    """
+    This function builds the condition matching a domain stored as text or as its code.
+    """
+    code = env.DOMAIN_CODES.get(domain)
+    return domain if code is None else {'$in': [domain, code]}
+
+
+def domain_name(value):
+    """
+    This function returns the domain of a stored domain value (its code or the domain itself).
+    """
+    if isinstance(value, int):
+        return DOMAIN_NAMES.get(value, str(value))
+    return value
+
+
+def parse_loc(loc: str) -> dict | None:
+    """
+    This function converts a "latitude,longitude" string into a GeoJSON point (None if it is not one).
+    """
+    try:
+        latitude, longitude = (float(part) for part in loc.split(','))
+    except ValueError:
+        return None
+    return {'type': 'Point', 'coordinates': [longitude, latitude]}
+
+
+def format_loc(loc) -> str:
+    """
+    This function converts a stored loc (GeoJSON point, string or None) into a "latitude,longitude" string.
+    """
+    if isinstance(loc, dict):
+        longitude, latitude = loc['coordinates']
+        return f'{latitude},{longitude}'
+    return loc or ''
+
+
+def compact(document: dict, collection: str | None = None) -> dict:
+    """
+    This function converts a validated document into the stored form of SCHEMA_VERSION.
+
+    Parameters:
+    - document (dict): The document in the API format.
+    - collection (str | None): The collection the document is written to.
+
+    Behavior:
+    - Keeps the fields as they are for SCHEMA_VERSION 1.
+    - Otherwise converts _id to an ObjectId (unless it is not an ObjectId string),
+      loc to a GeoJSON point (None if empty) and a coded domain to its code.
+    - Adds the meta field of time-series collections.
+    - Returns a copy, the document itself is not changed.
+    """
+    stored = dict(document)
+    if env.SCHEMA_VERSION >= 2:
+        if '_id' in stored:
+            stored['_id'] = object_id(stored['_id'])
+        if isinstance(stored.get('domain'), str):
+            stored['domain'] = env.DOMAIN_CODES.get(stored['domain'], stored['domain'])
+        if isinstance(stored.get('loc'), str):
+            stored['loc'] = parse_loc(stored['loc'])
+
+    if collection in env.TIMESERIES_COLLECTIONS:
+        stored['meta'] = {'client_host': stored.get('client_host'), 'domain': stored.get('domain')}
+    return stored
+
+
+def expand(document: dict) -> dict:
+    """
+    This function converts a stored document of either schema version into the API format, in place.
+
+    Behavior:
+    - Returns _id as a string, the domain instead of its code and loc as a "latitude,longitude" string.
+    - Drops the meta field of time-series collections.
+    """
+    document.pop('meta', None)
+    if isinstance(document.get('_id'), ObjectId):
+        document['_id'] = str(document['_id'])
+    if isinstance(document.get('domain'), int):
+        document['domain'] = domain_name(document['domain'])
+    if 'loc' in document and not isinstance(document['loc'], str):
+        document['loc'] = format_loc(document['loc'])
+    return document
+
+
+async def expanded(documents):
+    """
+    This generator yields the documents of an async iterable (e.g. a MongoDB cursor) in the API format.
+    """
+    async for document in documents:
+        yield expand(document)
@@ -0,0 +1,136 @@
+"""
+Full-text search over the content of the logs.
+
+Searches run on the text index of the content field (content_text), with MongoDB's
+$text syntax: words match logs containing any of them, "quoted phrases" must all be
+contained and -words exclude logs.
+
+Results are ordered by time (newest first, keyset cursor like the list routes) or by
+relevance (text score). The text score cannot be used in a query condition, so relevance
+pages use an offset cursor, limited to SEARCH_MAX_OFFSET results.
+
+If the text index does not exist (e.g. it is still being built), the search falls back to
+case-insensitive regular expressions with the same semantics, ordered by time. This scans
+the logs, so it is logged as a warning.
+"""
+import base64
+import json
+import logging
+import re
+
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure
+
+from src import env
+from src.services.pagination import PageParams, find_page, projection
+from src.services.schema import expand
+
+logger = logging.getLogger(__name__)
+
+# Error code of a $text query without a text index
+INDEX_NOT_FOUND = 27
+
+TOKEN_PATTERN = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+
+
+def parse_query(q: str) -> tuple[list[str], list[str], list[str]]:
+    """
+    This function splits a search string into words, phrases and excluded words or phrases.
+    """
+    words, phrases, excluded = [], [], []
+
+    for match in TOKEN_PATTERN.finditer(q):
+        negated_phrase, phrase, negated_word, word = match.groups()
+        if phrase is not None:
+            phrase = phrase.strip()
+            if phrase:
+                (excluded if negated_phrase else phrases).append(phrase)
+        elif negated_word:
+            excluded.append(word)
+        else:
+            words.append(word)
+
+    return words, phrases, excluded
+
+
+def regex_filter(q: str) -> dict:
+    """
+    This function builds the regular expression equivalent of a $text search on content.
+    """
+    words, phrases, excluded = parse_query(q)
+    conditions = [{'content': {'$regex': re.escape(phrase), '$options': 'i'}} for phrase in phrases]
+    if words:
+        conditions.append({'$or': [{'content': {'$regex': re.escape(word), '$options': 'i'}} for word in words]})
+    conditions += [{'content': {'$not': re.compile(re.escape(text), re.IGNORECASE)}} for text in excluded]
+
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Empty search")
+    return {'$and': conditions}
+
+
+def encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode()
+
+
+def decode_offset(cursor: str) -> int:
+    """
+    This function decodes a relevance cursor; raises HTTPException (400) if the cursor is malformed.
+    """
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))['offset']
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError
+        return offset
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def relevance_page(collection, model, query: dict, page: PageParams) -> dict:
+    """
+    This function reads one page of search results ordered by text score.
+    """
+    offset = decode_offset(page.cursor) if page.cursor else 0
+    if offset + page.limit > env.SEARCH_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"Relevance results are limited to {env.SEARCH_MAX_OFFSET}, "
+                                                    f"narrow the search or order by time")
+
+    fields = projection(model, page.fields) or {}
+    cursor = collection.find(query, fields | {'score': {'$meta': 'textScore'}})
+    cursor = cursor.sort([('score', {'$meta': 'textScore'}), ('_id', -1)]).skip(offset).limit(page.limit + 1)
+    documents = await cursor.to_list(length=page.limit + 1)
+
+    next_cursor = encode_offset(offset + page.limit) if len(documents) > page.limit else None
+    return {'items': [expand(document) for document in documents[:page.limit]], 'next_cursor': next_cursor}
+
+
+async def search_page(collection, model, filters: dict, q: str, order: str, page: PageParams) -> dict:
+    """
+    This function reads one page of the logs whose content matches a search.
+
+    Parameters:
+    - collection: The MongoDB collection to search.
+    - model: The domain model of the collection, used to validate the projected fields.
+    - filters (dict): The filter built by log_filters.
+    - q (str): The search in $text syntax.
+    - order (str): 'time' (newest first) or 'relevance' (best match first).
+    - page (PageParams): The cursor, page size and projection of the request.
+
+    Behavior:
+    - Searches with the text index and falls back to regular expressions if it is missing.
+    - Returns a dictionary with the items and the cursor of the next page (None on the last page).
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search")
+
+    query = filters | {'$text': {'$search': q}}
+    try:
+        if order == 'relevance':
+            return await relevance_page(collection, model, query, page)
+        return await find_page(collection, model, query, page)
+    except OperationFailure as error:
+        if error.code != INDEX_NOT_FOUND:
+            raise
+        logger.warning("Text index of %s is missing, searching with regular expressions", collection.full_name)
+
+    query = {'$and': [filters, regex_filter(q)]} if filters else regex_filter(q)
+    return await find_page(collection, model, query, page)
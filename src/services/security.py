@@ -1,4 +1,6 @@
 # Import necessary modules and functions
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from jose import JWTError, jwt
@@ -12,6 +14,7 @@ from src import env
 from src.domain.admin.user_in_db import UserInDB
 from src.api.token_data import TokenData
 from src.services import db
+from src.services.token_cache import token_cache
 
 # Initialize a password context with bcrypt hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -19,6 +22,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Define OAuth2 password bearer scheme for authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Thread pool for bcrypt (bcrypt releases the GIL, so threads verify in parallel)
+password_pool = ThreadPoolExecutor(max_workers=env.PASSWORD_VERIFY_WORKERS, thread_name_prefix="password")
+
+# Bounds the verifications running or waiting for the pool
+password_slots = asyncio.Semaphore(env.PASSWORD_VERIFY_MAX_PENDING)
+
 
 # Function to verify the provided plain password against the hashed password
 def verify_password(plain_password, hashed_password):
@@ -36,8 +45,24 @@ def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def verify_password_in_pool(plain_password, hashed_password):
+    """
+    This function verifies a password in the password thread pool instead of on the event loop.
+
+    Behavior:
+    - Runs verify_password in password_pool, so bcrypt does not block other requests.
+    - Raises HTTPException (503) if PASSWORD_VERIFY_MAX_PENDING verifications are already running or waiting.
+    """
+    if password_slots.locked():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many concurrent logins")
+
+    async with password_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_pool, verify_password, plain_password, hashed_password)
+
+
 # Function to get a user from the database based on the provided username
-def get_user(username: str):
+async def get_user(username: str):
     """
     This function retrieves a user from the database based on the provided username.
 
@@ -49,13 +74,13 @@ def get_user(username: str):
     - If a user is found, it constructs a UserInDB instance using the retrieved data and returns it.
     - If no user is found, it returns None.
     """
-    user = db.proces_hsa.user_dict.find_one({"username": username})
+    user = await db.get_database(env.AUTH_TENANT).user_dict.find_one({"username": username})
     if user:
         return UserInDB(**user)
 
 
 # Function to authenticate a user based on the provided username and password
-def authenticate_user(username: str, password: str):
+async def authenticate_user(username: str, password: str):
     """
     This function authenticates a user by validating the provided username and password.
 
@@ -66,10 +91,11 @@ def authenticate_user(username: str, password: str):
     Behavior:
     - It retrieves the user based on the provided username using the get_user function.
     - If a user is found and the provided password matches the stored hashed password, the user is considered authenticated and returned.
+      The password is verified in the password thread pool.
     - If no user is found or the password doesn't match, it returns None, indicating authentication failure.
     """
-    user = get_user(username)
-    if user and verify_password(password, user.hashed_password):
+    user = await get_user(username)
+    if user and await verify_password_in_pool(password, user.hashed_password):
         return user
     return None
 
@@ -130,13 +156,19 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     Asynchronously retrieves the current user based on the provided token.
 
     Steps:
-    1. Creates an exception to handle authentication failures (credentials_exception).
-    2. Decodes the token to extract the username (subject), handling potential exceptions.
-    3. Attempts to retrieve the user from the database based on the extracted username.
-    4. If the user is not found, raises an exception indicating authentication failure.
-       Otherwise, the user is returned.
+    1. Returns the cached user if the token was validated before and has not expired.
+    2. Creates an exception to handle authentication failures (credentials_exception).
+    3. Decodes the token to extract the username (subject), handling potential exceptions.
+    4. Attempts to retrieve the user from the database based on the extracted username.
+    5. If the user is not found, raises an exception indicating authentication failure.
+       Otherwise, the user is cached for the token and returned.
     """
 
+    # Skip decoding and the database for tokens validated before
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
     # Create an exception for handling authentication failures
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -160,12 +192,15 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         raise credentials_exception
 
     # Get user based on the username extracted from the token
-    user = get_user(token_data.username)
+    user = await get_user(token_data.username)
 
     if user is None:
         # Raise an exception if the user is not found in the database
         raise credentials_exception
 
+    # Cache the user until the token expires
+    token_cache.put(token, user, payload.get("exp", 0))
+
     return user
 
 
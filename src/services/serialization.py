@@ -0,0 +1,97 @@
+"""
+Fast JSON responses for the read routes.
+
+By default FastAPI validates the returned value against the response model of the route
+and converts it with jsonable_encoder before the json module encodes it, which walks every
+field of every log in Python. The logs were validated when they were written, so the read
+routes return RawJSONResponse instead: the documents from MongoDB are encoded as they are
+with orjson, and the response model is only used for the OpenAPI documentation.
+
+Run `python -m src.services.serialization` to compare the cost per log of both paths for
+the domain models.
+"""
+import datetime
+import json
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import parse_obj_as
+
+from src.api.log_page import LogPage
+from src.domain.backend import BackendLogs
+from src.domain.private import LoggingPrivate
+from src.domain.public import LoggingPublic
+from src.services.export import json_default
+
+
+def dumps(content) -> bytes:
+    """
+    This function encodes a value as JSON with orjson.
+
+    Behavior:
+    - Encodes datetimes in ISO 8601 format, like the other routes.
+    - Encodes the values orjson does not know about (e.g. ObjectId) with json_default.
+    """
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RawJSONResponse(ORJSONResponse):
+    """
+    JSON response encoding MongoDB documents directly, without pydantic models.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def sample_documents(model, count: int) -> list[dict]:
+    """
+    This function builds count documents of a model, as they are read from MongoDB.
+    """
+    values = {'route_action': 'get_all_private_logs', 'domain': 'example.com', 'client_host': '192.168.1.10',
+              'content': 'Request handled in 12 ms ' * 4, 'device_type': 'Desktop', 'country': 'SI',
+              'city': 'Ljubljana'}
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        model(**{name: value for name, value in values.items() if name in model.__fields__},
+              datum_vnosa=start + datetime.timedelta(seconds=index)).dict(by_alias=True)
+        for index in range(count)
+    ]
+
+
+def _per_document(encode, documents: list[dict], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode(documents)
+    return (time.perf_counter() - started) / rounds / len(documents) * 1e6
+
+
+def benchmark(count: int = 1000, rounds: int = 20):
+    """
+    This function prints the cost per log (in microseconds) of encoding a page of logs.
+
+    Behavior:
+    - models: every document converted into its model, validated against the list[model]
+      response model and encoded with jsonable_encoder and json, the former path of the routes.
+    - response model: the page validated against LogPage and encoded by FastAPI.
+    - raw: the documents encoded with RawJSONResponse.
+    """
+    paths = {
+        'models': lambda model, documents: json.dumps(jsonable_encoder(
+            parse_obj_as(list[model], [model(**document) for document in documents]))).encode(),
+        'response model': lambda model, documents: json.dumps(jsonable_encoder(
+            LogPage(items=documents, next_cursor=None))).encode(),
+        'raw': lambda model, documents: RawJSONResponse({'items': documents, 'next_cursor': None}).body,
+    }
+
+    print(f"{'model':<16}" + ''.join(f'{path:>16}' for path in paths) + '   (microseconds per log)')
+    for model in (LoggingPrivate, LoggingPublic, BackendLogs):
+        documents = sample_documents(model, count)
+        costs = [_per_document(lambda page: encode(model, page), documents, rounds) for encode in paths.values()]
+        print(f'{model.__name__:<16}' + ''.join(f'{cost:>16.2f}' for cost in costs))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,53 @@
+"""
+Tenant registry.
+
+Every tenant is a MongoDB database with the same log collections, mounted under its own
+URL prefix. Tenants come from the TENANTS setting; without it the two original tenants
+(hsa and portfolio_dj) are built from the DB_* settings.
+"""
+from pydantic import BaseModel
+
+from src import env
+
+
+class Tenant(BaseModel):
+    name: str
+    connection: str
+    database: str
+    prefix: str | None = None
+    tag: str | None = None
+
+    @property
+    def url_prefix(self) -> str:
+        return self.prefix or f'/logs_{self.name}'
+
+
+def load_tenants() -> dict[str, Tenant]:
+    """
+    This function builds the tenant registry from the settings.
+
+    Behavior:
+    - Parses TENANTS if it is set.
+    - Otherwise returns the hsa and portfolio_dj tenants with their original prefixes.
+    - Returns a dictionary of tenant name to Tenant.
+    """
+    configs = env.TENANTS or [
+        {
+            'name': 'hsa',
+            'connection': env.DB_CONNECTION_LOGGING,
+            'database': env.DB_PROCES,
+            'prefix': '/logs_hsa',
+            'tag': 'Hypnosis Studio Alen',
+        },
+        {
+            'name': 'portfolio_dj',
+            'connection': env.DB_CONNECTION_LOGGING_PDJ,
+            'database': env.DB_PROCESS,
+            'prefix': '/portfolio_dj',
+            'tag': 'Hypnosis Studio Alen',
+        },
+    ]
+    return {tenant.name: tenant for tenant in (Tenant(**config) for config in configs)}
+
+
+tenants = load_tenants()
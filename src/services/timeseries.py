@@ -0,0 +1,106 @@
+"""
+Migration of log collections to time-series collections (TIMESERIES_COLLECTIONS).
+
+An ordinary collection cannot be converted into a time-series collection and time-series
+collections cannot be renamed, so the migration:
+1. renames the ordinary collection to <name>_legacy_<timestamp>,
+2. creates the time-series collection under the old name, which receives the new logs
+   from then on (the API keeps working, older logs appear as they are copied),
+3. moves the logs of the legacy collection into it, MIGRATION_BATCH_SIZE at a time with a
+   pause of MIGRATION_PAUSE seconds, and drops the legacy collection once it is empty.
+
+Every batch is inserted before it is deleted from the legacy collection, and logs that are
+already in the time-series collection are not inserted again, so an interrupted migration
+continues where it stopped without copying a log twice.
+
+Run `python -m src.services.timeseries [tenant ...]` (all tenants by default).
+"""
+import asyncio
+import sys
+import time
+
+from src import env
+from src.services import db
+from src.services.indexes import collection_info, ensure_indexes, ensure_timeseries
+from src.services.retention import ttl_seconds
+from src.services.schema import compact
+from src.services.tenants import tenants
+
+
+async def convert(tenant: str, database, name: str):
+    """
+    This function replaces an ordinary log collection by a time-series collection of the same name.
+
+    Behavior:
+    - Renames the ordinary collection to <name>_legacy_<timestamp> and creates the time-series collection.
+    - Repeats this if a log was written between the two steps and created an ordinary collection again.
+    """
+    while not await ensure_timeseries(database, name, ttl_seconds(tenant, name)):
+        await database[name].rename(f'{name}_legacy_{time.time_ns()}')
+
+
+async def move_logs(database, name: str, legacy: str) -> int:
+    """
+    This function moves the logs of a legacy collection into the time-series collection and drops it.
+
+    Behavior:
+    - Inserts every batch in the stored form of the time-series collection, leaving out the logs
+      an earlier, interrupted run already inserted, then deletes the batch from the legacy collection.
+    - Returns the number of inserted logs.
+    """
+    source, target = database[legacy], database[name]
+    moved = 0
+
+    while True:
+        documents = await source.find({}).sort('datum_vnosa', 1).to_list(length=env.MIGRATION_BATCH_SIZE)
+        if not documents:
+            await source.drop()
+            return moved
+
+        # Look the logs up by the _ids they were inserted with (ObjectIds for string _ids)
+        stored = [compact(document, name) for document in documents]
+        copied = {document['_id'] async for document in target.find(
+            {'datum_vnosa': {'$gte': documents[0]['datum_vnosa'], '$lte': documents[-1]['datum_vnosa']},
+             '_id': {'$in': [document['_id'] for document in stored]}}, {'_id': 1})}
+        missing = [document for document in stored if document['_id'] not in copied]
+        if missing:
+            await target.insert_many(missing, ordered=False)
+
+        await source.delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+        moved += len(missing)
+        await asyncio.sleep(env.MIGRATION_PAUSE)
+
+
+async def migrate_tenant(tenant: str) -> dict:
+    """
+    This function migrates the TIMESERIES_COLLECTIONS of a tenant and creates their indexes.
+
+    Behavior:
+    - Returns a dictionary of collection name to the number of moved logs.
+    """
+    database = db.get_database(tenant)
+    report = {}
+
+    for name in sorted(env.TIMESERIES_COLLECTIONS):
+        await convert(tenant, database, name)
+        report[name] = 0
+        for legacy in sorted(await database.list_collection_names(filter={'name': {'$regex': f'^{name}_legacy_'}})):
+            report[name] += await move_logs(database, name, legacy)
+
+    await ensure_indexes(tenant, database, tuple(sorted(env.TIMESERIES_COLLECTIONS)))
+    return report
+
+
+async def migrate_all(tenant_names):
+    if not env.TIMESERIES_COLLECTIONS:
+        print('TIMESERIES_COLLECTIONS is not set')
+        return
+
+    for tenant in tenant_names:
+        for name, moved in (await migrate_tenant(tenant)).items():
+            info = await collection_info(db.get_database(tenant), name)
+            print(f"{tenant}/{name}: {moved} logs moved, collection type {info.get('type') if info else None}")
+
+
+if __name__ == '__main__':
+    asyncio.run(migrate_all(sys.argv[1:] or tuple(tenants)))
@@ -0,0 +1,90 @@
+"""
+Cache of validated access tokens.
+
+get_current_user runs for every protected route. Once a token was decoded and its user
+loaded from the database, the user is kept here under the SHA-256 hash of the token, so
+repeated requests with the same token skip both the JWT validation and the database.
+An entry lives until the token expires, but at most TOKEN_CACHE_TTL seconds, which bounds
+how long a disabled user keeps access through a cached token.
+
+The users are changed directly in the database, outside the API, so the TTL (60 seconds by
+default) is the revocation window: disabling or deleting a user takes effect after it at the
+latest. To revoke access at once, call DELETE /admin/token_cache/{username}. Replacing the
+users (db.drop) clears the cache.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+
+from src import env
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token hash -> (expiry, user).
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        """
+        This method returns the cached user of a token, or None if the token is not cached or expired.
+        """
+        key = self.key(token)
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token: str, user, expires_at: float):
+        """
+        This method caches the user of a validated token until min(expires_at, now + ttl).
+        """
+        if self.max_size <= 0:
+            return
+
+        self.entries[self.key(token)] = (min(expires_at, time.time() + self.ttl), user)
+        self.entries.move_to_end(self.key(token))
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate_user(self, username: str) -> int:
+        """
+        This method removes every cached token of a user and returns how many were removed.
+        """
+        keys = [key for key, (_, user) in self.entries.items() if user.username == username]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = TokenCache(env.TOKEN_CACHE_SIZE, env.TOKEN_CACHE_TTL)
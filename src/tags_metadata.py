@@ -2,5 +2,17 @@ tags_metadata = [
     {
         "name": "Hypnosis Studio Alen",
         "description": "Logi za Private in Public. Uporablja se /private in /public za pogled v dejanja admina za lažje reševanje napak",
+    },
+    {
+        "name": "Admin",
+        "description": "Administracija storitve: statistika indeksov in podobno. Zahteva prijavo.",
+    },
+    {
+        "name": "Exports",
+        "description": "Izvozi v ozadju: stanje izvoza in prenos datoteke, ko je izvoz končan (podpira Range).",
+    },
+    {
+        "name": "Health",
+        "description": "Preverjanje delovanja za load balancer: /healthz (proces živi) in /readyz (baza dosegljiva, pool ni zasičen) ter metrike v formatu Prometheus na /metrics.",
     }
 ]
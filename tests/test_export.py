@@ -0,0 +1,24 @@
+import asyncio
+import io
+import zipfile
+
+from openpyxl import load_workbook
+
+from src.services.export import xlsx_stream
+
+
+async def documents(count: int):
+    for index in range(count):
+        yield {'content': f'unique content {index}', 'count': index}
+
+
+def test_xlsx_writes_strings_inline():
+    async def run():
+        return b''.join([chunk async for chunk in xlsx_stream(documents(250), ['content', 'count'], 'logs',
+                                                              batch_size=100)])
+
+    data = asyncio.run(run())
+    # No shared strings table, which would grow with every distinct content
+    assert not any('sharedStrings' in name for name in zipfile.ZipFile(io.BytesIO(data)).namelist())
+    rows = list(load_workbook(io.BytesIO(data), read_only=True)['logs'].values)
+    assert rows[0] == ('content', 'count') and rows[-1] == ('unique content 249', 249) and len(rows) == 251
@@ -0,0 +1,16 @@
+from src.domain.geo_data import GeoData
+from src.services.geoip import CsvResolver
+
+
+def test_csv_resolver_tolerates_short_and_invalid_rows(tmp_path):
+    path = tmp_path / 'networks.csv'
+    path.write_text('network,country,region,city,latitude,longitude,org\n'
+                    '10.0.0.0/8,SI,Osrednjeslovenska\n'
+                    'not a network,DE,,,,,\n'
+                    '192.168.0.0/16,DE,Bayern,Munich,48.1,11.6,AS2\n', encoding='utf-8')
+    resolver = CsvResolver(str(path))
+
+    record = resolver.resolve('10.1.2.3')
+    assert record == {'country': 'SI', 'region': 'Osrednjeslovenska', 'city': '', 'loc': '', 'org': ''}
+    GeoData(ip='10.1.2.3', **record)
+    assert resolver.resolve('192.168.1.1')['loc'] == '48.1,11.6'
@@ -0,0 +1,71 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from src import env
+from src.services.ingest_buffer import IngestBuffer
+
+
+class FakeCollection:
+    name = 'logging_public'
+    full_name = 'hsa.logging_public'
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.database = self
+        self.written = []
+
+    def with_options(self, **options):
+        return self
+
+    async def insert_many(self, documents, ordered=True):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.written.extend(documents)
+
+
+def flush(collection, batch):
+    async def run():
+        buffer = IngestBuffer(collection)
+        await buffer._flush(batch)
+        return buffer
+    return asyncio.run(run())
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(env, 'INGEST_RETRY_BACKOFF', 0)
+    collection = FakeCollection([AutoReconnect('failover'), AutoReconnect('failover')])
+    buffer = flush(collection, [{'content': 'a'}, {'content': 'b'}])
+    assert (buffer.written, buffer.failed, len(collection.written)) == (2, 0, 2)
+
+
+def test_only_rejected_documents_are_dropped():
+    error = BulkWriteError({'nInserted': 2, 'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'invalid'}]})
+    buffer = flush(FakeCollection([error]), [{'content': 'a'}, {'content': 'b'}, {'content': 'c'}])
+    assert (buffer.written, buffer.failed) == (2, 1)
+
+
+def test_flush_task_survives_unexpected_errors(monkeypatch):
+    monkeypatch.setattr(env, 'INGEST_FLUSH_INTERVAL', 0)
+    collection = FakeCollection([])
+
+    async def run():
+        buffer = IngestBuffer(collection)
+        flush_batch = buffer._flush
+        calls = []
+
+        async def failing_once(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise RuntimeError('unexpected')
+            await flush_batch(batch)
+
+        buffer._flush = failing_once
+        buffer.submit({'content': 'lost'})
+        await asyncio.sleep(0.01)
+        buffer.submit({'content': 'written'})
+        await buffer.drain()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.task.done() and collection.written == [{'content': 'written'}]
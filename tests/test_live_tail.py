@@ -0,0 +1,81 @@
+import asyncio
+import datetime
+
+from src.services.live_tail import Broker, Subscriber
+from src.services.pagination import log_filters, matches_filters
+
+
+def test_aware_bounds_are_naive_utc():
+    filters = log_filters(datetime.datetime(2026, 10, 18, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+                          None, None, None, None)
+    assert filters['datum_vnosa']['$gte'] == datetime.datetime(2026, 10, 18, 10, 0)
+
+
+def test_publish_with_z_bound():
+    broker = Broker()
+    since = datetime.datetime.fromisoformat('2026-10-18T10:00:00+00:00')
+    subscriber = Subscriber(log_filters(since, None, None, None, None))
+    broker.subscribers[('hsa', 'logging_public')] = {subscriber}
+
+    async def publish():
+        # Naive, aware and string times of the logs all compare with the bound
+        for value in (datetime.datetime(2026, 10, 18, 9, 0), '2026-10-18T10:30:00Z',
+                      datetime.datetime(2026, 10, 18, 11, 0, tzinfo=datetime.timezone.utc)):
+            broker.publish('hsa', 'logging_public', {'content': 'c', 'datum_vnosa': value})
+        return subscriber.queue.qsize()
+
+    assert asyncio.run(publish()) == 2
+
+
+def test_failing_subscriber_does_not_fail_publish():
+    class Failing:
+        def offer(self, document):
+            raise TypeError('broken')
+
+    broker = Broker()
+    broker.subscribers[('hsa', 'logging_public')] = {Failing()}
+    broker.publish('hsa', 'logging_public', {'content': 'c'})
+
+
+def test_matches_filters_with_z_string():
+    filters = {'datum_vnosa': {'$lt': datetime.datetime(2026, 10, 18, 10, 0)}}
+    assert matches_filters({'datum_vnosa': '2026-10-18T09:59:00Z'}, filters)
+
+
+def test_sse_subscriber_is_removed_without_iterating(monkeypatch):
+    from src.services import live_tail
+    broker = Broker()
+    monkeypatch.setattr(live_tail, 'broker', broker)
+
+    async def run():
+        response = live_tail.sse_stream('hsa', 'logging_public', {}, request=None)
+        assert broker.count() == 1
+        # The client went away before the first chunk: the body is dropped, only the background task runs
+        await response.body_iterator.aclose()
+        await response.background()
+        return broker.count()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_sse_subscriber_is_removed_on_early_disconnect(monkeypatch):
+    from src.services import live_tail
+    broker = Broker()
+    monkeypatch.setattr(live_tail, 'broker', broker)
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        pass
+
+    class Disconnected:
+        async def is_disconnected(self):
+            return True
+
+    async def run():
+        response = live_tail.sse_stream('hsa', 'logging_public', {}, Disconnected())
+        await response({'type': 'http'}, receive, send)
+        return broker.count()
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,38 @@
+from starlette.requests import Request
+
+from src import env
+from src.services.login_guard import LoginThrottle, client_ip
+
+
+def request(forwarded_for: str | None) -> Request:
+    headers = [(b'x-forwarded-for', forwarded_for.encode())] if forwarded_for else []
+    return Request({'type': 'http', 'headers': headers, 'client': ('10.0.0.1', 1234)})
+
+
+def test_client_ip_behind_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(env, 'TRUSTED_PROXY_HOPS', 1)
+    # The first entry is set by the client, the last one by the proxy
+    assert client_ip(request('6.6.6.6, 1.2.3.4')) == '1.2.3.4'
+    assert client_ip(request(None)) == '10.0.0.1'
+
+
+def test_client_ip_without_proxy(monkeypatch):
+    monkeypatch.setattr(env, 'TRUSTED_PROXY_HOPS', 0)
+    assert client_ip(request('1.2.3.4')) == '10.0.0.1'
+
+
+def test_stale_failures_are_forgotten(monkeypatch):
+    monkeypatch.setattr('time.time', lambda: 1000.0)
+    throttle = LoginThrottle(5, 60, 100)
+    throttle.failed('user', '1.2.3.4')
+    monkeypatch.setattr('time.time', lambda: 1100.0)
+    throttle.check('other', '5.6.7.8')
+    assert throttle.failures == {}
+
+
+def test_key_count_is_capped(monkeypatch):
+    monkeypatch.setattr('time.time', lambda: 1000.0)
+    throttle = LoginThrottle(5, 60, 4)
+    for index in range(10):
+        throttle.failed('user', f'10.0.0.{index}')
+    assert list(throttle.failures) == ['ip:10.0.0.7', 'ip:10.0.0.8', 'user:user', 'ip:10.0.0.9']
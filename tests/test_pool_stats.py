@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from src.services.pool_stats import PoolStats
+
+
+def check_out(stats: PoolStats, address: tuple, count: int):
+    event = SimpleNamespace(address=address)
+    for _ in range(count):
+        stats.connection_check_out_started(event)
+        stats.connection_checked_out(event)
+
+
+def test_saturation_is_per_server():
+    stats = PoolStats()
+    # Two servers with 2 of 3 connections each: 4 in total, but no pool is full
+    check_out(stats, ('a', 27017), 2)
+    check_out(stats, ('b', 27017), 2)
+    stats.connection_check_out_started(SimpleNamespace(address=('a', 27017)))
+    assert stats.saturated(3) == []
+
+    check_out(stats, ('b', 27017), 1)
+    stats.connection_check_out_started(SimpleNamespace(address=('b', 27017)))
+    assert stats.saturated(3) == ['b:27017']
@@ -0,0 +1,25 @@
+import asyncio
+import datetime
+
+import pytest
+
+from src.services.timeseries import move_logs
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+
+def test_move_logs_twice_does_not_copy_logs_again(monkeypatch):
+    monkeypatch.setattr('src.env.MIGRATION_PAUSE', 0)
+    database = mongomock_motor.AsyncMongoMockClient()['hsa']
+    logs = [{'_id': f'{index:024x}', 'content': 'c', 'domain': 'X',
+             'datum_vnosa': datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=index)} for index in range(5)]
+
+    async def run():
+        await database.logs_legacy.insert_many([dict(log) for log in logs])
+        assert await move_logs(database, 'logs', 'logs_legacy') == 5
+        # An interrupted run leaves the copied logs in the legacy collection
+        await database.logs_legacy.insert_many([dict(log) for log in logs])
+        assert await move_logs(database, 'logs', 'logs_legacy') == 0
+        return await database.logs.count_documents({})
+
+    assert asyncio.run(run()) == 5